@@ -8,6 +8,7 @@ This example demonstrates how to build a reactive agent that:
 3. Responds intelligently using Kimi
 
 Usage:
+    pip install kimi-agent-sdk orjson jsonschema
     GITHUB_TOKEN=ghp_xxx python github_bot.py
 """
 
@@ -15,19 +16,90 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import json
+import hashlib
+import mmap
 import os
-from dataclasses import dataclass
+import re
+import struct
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from datetime import datetime
-from http.server import HTTPServer, BaseHTTPRequestHandler
 from pathlib import Path
-from typing import Any
+from typing import Any, ClassVar
 
+import orjson
+from aiohttp import web
+from jsonschema import Draft202012Validator
 from kimi_agent_sdk import prompt
-from kimi_agent_sdk.connectors import Event, EventBus, StateManager, FileStateBackend
+from kimi_agent_sdk.connectors import Event, EventBus, StateManager, StateBackend
+from kimi_agent_sdk.connectors.state import State
 
 
-@dataclass
+# Prompt templates are fixed at import time so identical inputs always produce
+# byte-identical prompts, which keeps prompt caches hitting.
+REVIEW_PROMPT_TEMPLATE = """Review this Pull Request:
+
+**Title:** {title}
+**Author:** {author}
+**Description:** {description}
+
+**Files changed:** {files}
+
+Please provide:
+1. Summary of changes
+2. Code quality assessment
+3. Potential issues or bugs
+4. Suggestions for improvement
+5. Overall recommendation (approve/request changes)
+
+Format your response as JSON:
+{{
+    "summary": "brief summary",
+    "quality_score": 1-10,
+    "issues": ["issue1", "issue2"],
+    "suggestions": ["suggestion1"],
+    "recommendation": "approve|request_changes|comment"
+}}"""
+
+ISSUE_ANALYSIS_PROMPT_TEMPLATE = """Analyze this GitHub issue:
+
+**Title:** {title}
+**Description:** {body}
+
+Suggest:
+1. Labels (bug, feature, documentation, etc.)
+2. Priority (low, medium, high, critical)
+3. Whether it needs immediate attention
+
+Format as JSON."""
+
+# Shape of the JSON object requested by REVIEW_PROMPT_TEMPLATE
+REVIEW_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "required": ["summary", "quality_score", "issues", "suggestions", "recommendation"],
+    "properties": {
+        "summary": {"type": "string"},
+        "quality_score": {"type": "integer", "minimum": 1, "maximum": 10},
+        "issues": {"type": "array", "items": {"type": "string"}},
+        "suggestions": {"type": "array", "items": {"type": "string"}},
+        "recommendation": {"enum": ["approve", "request_changes", "comment"]},
+    },
+}
+_REVIEW_VALIDATOR = Draft202012Validator(REVIEW_SCHEMA)
+# Outermost {...} span, skipping any prose the model puts around the JSON
+_JSON_SPAN = re.compile(rb"\{.*\}", re.DOTALL)
+# Length prefix of each record in the LogStateBackend data log
+_LOG_HEADER = struct.Struct(">I")
+
+
+def format_timestamp_ns(ns: int) -> str:
+    """Format a `time.time_ns()` timestamp for display."""
+    return datetime.fromtimestamp(ns / 1e9).isoformat()
+
+
+@dataclass(slots=True)
 class PRContext:
     """Context for a PR review session."""
     pr_id: str
@@ -38,17 +110,410 @@ class PRContext:
     files: list[str]
     review_comments: list[dict]
     status: str  # "pending", "reviewing", "approved", "changes_requested"
+    
+    # Leading element of the stored form; bump whenever the field layout changes
+    SCHEMA_VERSION: ClassVar[int] = 1
+    
+    def to_state(self) -> list[Any]:
+        """Compact positional form stored in the state backend."""
+        return [
+            self.SCHEMA_VERSION,
+            self.pr_id,
+            self.repo,
+            self.author,
+            self.title,
+            self.description,
+            self.files,
+            self.review_comments,
+            self.status,
+        ]
+    
+    @classmethod
+    def from_state(cls, data: Any) -> PRContext | None:
+        """Rebuild a context from `to_state()` output; None for unknown layouts."""
+        if not isinstance(data, list) or not data or data[0] != cls.SCHEMA_VERSION:
+            return None
+        return cls(*data[1:])
+
+
+@dataclass
+class _CacheEntry:
+    state: State
+    dirty: bool
+    persisted_version: int  # Version currently stored by the inner backend (0 = none)
+
+
+class CachedStateBackend(StateBackend):
+    """Write-back cache in front of another state backend.
+    
+    Reads are served from memory and writes are coalesced: dirty entries are
+    flushed to the inner backend every `flush_interval_ms`, so a key updated
+    several times between flushes costs a single write.
+    
+    Versions seen through the cache count every update; the inner backend
+    only sees one version bump per flush. If another writer of the inner
+    backend gets in first, the flushed write is dropped and reported, and
+    the next set() based on it fails so the caller can re-read and retry.
+    """
+    
+    def __init__(
+        self,
+        inner: StateBackend,
+        *,
+        max_size: int = 1024,
+        flush_interval_ms: int = 200,
+    ) -> None:
+        self.max_size = max_size
+        self.flush_interval_ms = flush_interval_ms
+        self._inner = inner
+        self._hot: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task[None] | None = None
+    
+    async def get(self, key: str) -> State | None:
+        async with self._lock:
+            entry = await self._load(key)
+            return entry.state if entry else None
+    
+    async def set(self, state: State) -> bool:
+        async with self._lock:
+            entry = await self._load(state.key)
+            current = entry.state.version if entry else 0
+            if current and current != state.version - 1:
+                return False  # Version conflict
+            persisted = entry.persisted_version if entry else 0
+            self._hot[state.key] = _CacheEntry(state, dirty=True, persisted_version=persisted)
+            self._hot.move_to_end(state.key)
+            self._evict()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        return True
+    
+    async def delete(self, key: str) -> bool:
+        async with self._lock:
+            entry = self._hot.pop(key, None)
+            deleted = await self._inner.delete(key)
+            return deleted or entry is not None
+    
+    async def list_keys(self, prefix: str = "") -> list[str]:
+        # The inner backend may report keys in its own (e.g. filesystem-safe)
+        # spelling, so flush first and let it be the single source of keys.
+        async with self._lock:
+            await self._flush_dirty()
+            return await self._inner.list_keys(prefix)
+    
+    async def clear(self) -> int:
+        async with self._lock:
+            await self._flush_dirty()
+            self._hot.clear()
+            return await self._inner.clear()
+    
+    async def flush(self) -> int:
+        """Write all dirty entries to the inner backend. Returns count written."""
+        async with self._lock:
+            return await self._flush_dirty()
+    
+    async def close(self) -> None:
+        """Stop the background flush and persist pending writes."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+    
+    async def _flush_dirty(self) -> int:
+        written = 0
+        conflicts: list[str] = []
+        for key, entry in self._hot.items():
+            if not entry.dirty:
+                continue
+            version = entry.persisted_version + 1
+            if not await self._inner.set(replace(entry.state, version=version)):
+                conflicts.append(key)
+                continue
+            entry.dirty = False
+            entry.persisted_version = version
+            written += 1
+        for key in conflicts:
+            # Someone else wrote the inner backend since we last read it. Their
+            # state wins; it is cached one version past the lost write, so
+            # whoever made that write gets a conflict on their next set() and
+            # re-reads instead of building on state that was never stored.
+            lost = self._hot.pop(key).state
+            stored = await self._inner.get(key)
+            if stored is not None:
+                self._hot[key] = _CacheEntry(
+                    replace(stored, version=lost.version + 1),
+                    dirty=False,
+                    persisted_version=stored.version,
+                )
+            print(
+                f"⚠️  Dropped cached write to {key} (v{lost.version}): "
+                f"stored state is at v{stored.version if stored else None}"
+            )
+        self._evict()
+        return written
+    
+    async def _load(self, key: str) -> _CacheEntry | None:
+        entry = self._hot.get(key)
+        if entry is None:
+            state = await self._inner.get(key)
+            if state is None:
+                return None
+            entry = _CacheEntry(state, dirty=False, persisted_version=state.version)
+            self._hot[key] = entry
+            self._evict()
+        self._hot.move_to_end(key)
+        return entry
+    
+    def _evict(self) -> None:
+        # Only clean entries can be dropped; dirty ones wait for the next flush.
+        excess = len(self._hot) - self.max_size
+        if excess <= 0:
+            return
+        for key in [key for key, entry in self._hot.items() if not entry.dirty][:excess]:
+            del self._hot[key]
+    
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            await self.flush()
+
+
+@dataclass(slots=True)
+class _LogRecord:
+    offset: int  # Start of the JSON payload in the data log
+    length: int
+    version: int
+
+
+class LogStateBackend(StateBackend):
+    """Append-only state log read through a memory map.
+    
+    Every `set` appends one length-prefixed JSON record to `data.bin` and
+    every `delete` appends a tombstone. An in-memory index of the latest
+    record per key is rebuilt by replaying the log on startup, so listing
+    keys never touches the disk and a `get` is a slice of the mapped file
+    instead of a stat + open + read per key.
+    
+    Superseded records are never reclaimed; `clear()` truncates the log.
+    """
+    
+    def __init__(self, base_dir: str | Path = "./.agent_state") -> None:
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._path = self.base_dir / "data.bin"
+        self._file = open(self._path, "a+b")
+        self._mm: mmap.mmap | None = None
+        self._index: dict[str, _LogRecord] = {}
+        self._replay()
+    
+    async def get(self, key: str) -> State | None:
+        record = self._index.get(key)
+        if record is None:
+            return None
+        data = self._load(record)
+        return State(
+            key=key,
+            value=data["value"],
+            version=record.version,
+            metadata=data.get("metadata", {}),
+        )
+    
+    async def set(self, state: State) -> bool:
+        existing = self._index.get(state.key)
+        if existing and existing.version != state.version - 1:
+            return False  # Version conflict
+        payload = orjson.dumps({
+            "key": state.key,
+            "value": state.value,
+            "version": state.version,
+            "metadata": state.metadata,
+        })
+        offset = self._append(payload)
+        self._index[state.key] = _LogRecord(offset, len(payload), state.version)
+        return True
+    
+    async def delete(self, key: str) -> bool:
+        if self._index.pop(key, None) is None:
+            return False
+        self._append(orjson.dumps({"key": key, "deleted": True}))
+        return True
+    
+    async def list_keys(self, prefix: str = "") -> list[str]:
+        return [key for key in self._index if key.startswith(prefix)]
+    
+    async def clear(self) -> int:
+        count = len(self._index)
+        self._unmap()
+        self._file.truncate(0)
+        self._index.clear()
+        return count
+    
+    def close(self) -> None:
+        self._unmap()
+        self._file.close()
+    
+    def _append(self, payload: bytes) -> int:
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell() + _LOG_HEADER.size
+        self._file.write(_LOG_HEADER.pack(len(payload)) + payload)
+        self._file.flush()
+        return offset
+    
+    def _load(self, record: _LogRecord) -> dict[str, Any]:
+        end = record.offset + record.length
+        if self._mm is None or len(self._mm) < end:
+            # The log grew since it was mapped; map the whole file again
+            self._unmap()
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        with memoryview(self._mm) as view:
+            return orjson.loads(view[record.offset:end])
+    
+    def _unmap(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+    
+    def _replay(self) -> None:
+        size = self._file.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        pos = 0
+        with memoryview(self._mm) as view:
+            while pos + _LOG_HEADER.size <= size:
+                (length,) = _LOG_HEADER.unpack_from(view, pos)
+                start = pos + _LOG_HEADER.size
+                if start + length > size:
+                    break
+                try:
+                    data = orjson.loads(view[start:start + length])
+                except orjson.JSONDecodeError:
+                    break
+                if data.get("deleted"):
+                    self._index.pop(data["key"], None)
+                else:
+                    self._index[data["key"]] = _LogRecord(start, length, data.get("version", 1))
+                pos = start + length
+        if pos < size:
+            # Drop a record torn by a crash mid-append
+            self._unmap()
+            self._file.truncate(pos)
+
+
+@dataclass
+class _PromptCacheEntry:
+    text: str
+    expires_at: float  # time.monotonic() deadline
+
+
+class PromptLRU:
+    """LRU cache of prompt responses with a per-entry TTL."""
+    
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[bytes, _PromptCacheEntry] = OrderedDict()
+        self._lock = asyncio.Lock()
+    
+    @staticmethod
+    def key(prompt_text: str, model: str = "") -> bytes:
+        """Cache key for a prompt, namespaced by model.
+        
+        Whitespace differences do not break hits; the same prompt sent to a
+        different model gets a different key.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(model.encode("utf-8"))
+        h.update(b"\0")
+        h.update(" ".join(prompt_text.split()).encode("utf-8"))
+        return h.digest()
+    
+    async def get(self, key: bytes) -> str | None:
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry.text
+    
+    async def put(self, key: bytes, text: str) -> None:
+        async with self._lock:
+            self._entries[key] = _PromptCacheEntry(text, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
 
 
 class GitHubBot:
     """Event-driven GitHub bot using Kimi Agent."""
     
-    def __init__(self, github_token: str, state_dir: str = "./.bot_state") -> None:
+    def __init__(
+        self,
+        github_token: str,
+        state_dir: str = "./.bot_state",
+        max_concurrent_reviews: int = 8,
+        model: str | None = None,
+    ) -> None:
         self.github_token = github_token
+        self.model = model
         self.bus = EventBus()
-        self.state = StateManager(FileStateBackend(state_dir))
+        self._state_log = LogStateBackend(state_dir)
+        self._state_backend = CachedStateBackend(self._state_log)
+        self.state = StateManager(self._state_backend)
+        self.prompt_cache = PromptLRU()
+        # Reviews run in background tasks: at most max_concurrent_reviews LLM calls
+        # overall, and one review (or update) per PR at a time
+        self._review_sem = asyncio.Semaphore(max_concurrent_reviews)
+        # Weak values: a PR's lock goes away once no review or update holds it
+        self._pr_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        self._tasks: set[asyncio.Task[None]] = set()
         self._setup_handlers()
     
+    def _pr_lock(self, pr_id: str) -> asyncio.Lock:
+        """Return the lock serializing work on ``pr_id``, creating it on first use."""
+        lock = self._pr_locks.get(pr_id)
+        if lock is None:
+            lock = self._pr_locks[pr_id] = asyncio.Lock()
+        return lock
+    
+    async def wait_idle(self) -> None:
+        """Wait for all background reviews, including ones they trigger."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def close(self) -> None:
+        """Finish background reviews and flush pending state to disk."""
+        await self.wait_idle()
+        await self._state_backend.close()
+        self._state_log.close()
+    
+    def _request_review(self, pr_id: str, priority: str) -> None:
+        task = asyncio.create_task(self.bus.emit(Event(
+            type="agent.pr.review_requested",
+            data={"pr_id": pr_id, "priority": priority}
+        )))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def cached_prompt(self, prompt_text: str) -> str:
+        """Run a prompt through Kimi, reusing the response for identical prompts."""
+        key = self.prompt_cache.key(prompt_text, self.model or "")
+        cached = await self.prompt_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        text = ""
+        async for message in prompt(prompt_text, model=self.model, yolo=True):
+            text += message.extract_text()
+        await self.prompt_cache.put(key, text)
+        return text
+    
     def _setup_handlers(self) -> None:
         """Set up event handlers for GitHub events."""
         
@@ -72,13 +537,10 @@ class GitHubBot:
                 status="pending"
             )
             
-            await self.state.set(f"pr:{pr_id}", context.__dict__)
+            await self.state.set(f"pr:{pr_id}", context.to_state())
             
             # Trigger review
-            await self.bus.emit(Event(
-                type="agent.pr.review_requested",
-                data={"pr_id": pr_id, "priority": "normal"}
-            ))
+            self._request_review(pr_id, "normal")
         
         @self.bus.on("github.pr.updated")
         async def on_pr_updated(event: Event) -> None:
@@ -88,33 +550,29 @@ class GitHubBot:
             
             print(f"📝 PR updated: {pr_id}")
             
-            # Update context
-            context_data = await self.state.get(f"pr:{pr_id}")
-            if context_data:
-                context_data["files"] = pr_data.get("files", [])
-                context_data["status"] = "pending"  # Re-review needed
-                await self.state.set(f"pr:{pr_id}", context_data)
-                
+            # Update context (waits for an in-flight review of this PR)
+            async with self._pr_lock(pr_id):
+                context = PRContext.from_state(await self.state.get(f"pr:{pr_id}"))
+                if context:
+                    context.files = pr_data.get("files", [])
+                    context.status = "pending"  # Re-review needed
+                    await self.state.set(f"pr:{pr_id}", context.to_state())
+            
+            if context:
                 # Trigger re-review
-                await self.bus.emit(Event(
-                    type="agent.pr.review_requested",
-                    data={"pr_id": pr_id, "priority": "high"}
-                ))
+                self._request_review(pr_id, "high")
         
-        @self.bus.on("agent.pr.review_requested")
         async def review_pr(event: Event) -> None:
             """Agent reviews a PR."""
             pr_id = event.data["pr_id"]
             priority = event.data.get("priority", "normal")
             
             # Load context
-            context_data = await self.state.get(f"pr:{pr_id}")
-            if not context_data:
+            context = PRContext.from_state(await self.state.get(f"pr:{pr_id}"))
+            if not context:
                 print(f"⚠️  No context found for {pr_id}")
                 return
             
-            context = PRContext(**context_data)
-            
             # Skip if already reviewed
             if context.status == "approved":
                 print(f"⏭️  PR {pr_id} already approved, skipping")
@@ -122,47 +580,28 @@ class GitHubBot:
             
             # Mark as reviewing
             context.status = "reviewing"
-            await self.state.set(f"pr:{pr_id}", context.__dict__)
+            await self.state.set(f"pr:{pr_id}", context.to_state())
             
             print(f"🔍 Reviewing PR {pr_id} (priority: {priority})")
             
             # Build review prompt
-            review_prompt = f"""Review this Pull Request:
-
-**Title:** {context.title}
-**Author:** {context.author}
-**Description:** {context.description}
-
-**Files changed:** {', '.join(context.files)}
-
-Please provide:
-1. Summary of changes
-2. Code quality assessment
-3. Potential issues or bugs
-4. Suggestions for improvement
-5. Overall recommendation (approve/request changes)
-
-Format your response as JSON:
-{{
-    "summary": "brief summary",
-    "quality_score": 1-10,
-    "issues": ["issue1", "issue2"],
-    "suggestions": ["suggestion1"],
-    "recommendation": "approve|request_changes|comment"
-}}"""
+            review_prompt = REVIEW_PROMPT_TEMPLATE.format_map({
+                "title": context.title,
+                "author": context.author,
+                "description": context.description,
+                "files": ", ".join(sorted(context.files)),
+            })
             
             try:
                 # Get review from Kimi
-                review_text = ""
-                async for message in prompt(review_prompt, yolo=True):
-                    review_text += message.extract_text()
+                review_text = await self.cached_prompt(review_prompt)
                 
-                # Parse review (simplified - in production use JSON parser)
+                # Parse review
                 review_result = self._parse_review(review_text)
                 
                 # Store review
                 context.review_comments.append({
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp_ns": time.time_ns(),
                     "review": review_result,
                     "raw": review_text[:500]  # Truncate for storage
                 })
@@ -175,7 +614,7 @@ Format your response as JSON:
                     context.status = "changes_requested"
                     print(f"📝 Requested changes for PR {pr_id}")
                 
-                await self.state.set(f"pr:{pr_id}", context.__dict__)
+                await self.state.set(f"pr:{pr_id}", context.to_state())
                 
                 # Emit review complete event
                 await self.bus.emit(Event(
@@ -190,7 +629,13 @@ Format your response as JSON:
             except Exception as e:
                 print(f"❌ Error reviewing PR {pr_id}: {e}")
                 context.status = "error"
-                await self.state.set(f"pr:{pr_id}", context.__dict__)
+                await self.state.set(f"pr:{pr_id}", context.to_state())
+        
+        @self.bus.on("agent.pr.review_requested")
+        async def on_review_requested(event: Event) -> None:
+            """Run a review once this PR is free and a review slot opens up."""
+            async with self._pr_lock(event.data["pr_id"]), self._review_sem:
+                await review_pr(event)
         
         @self.bus.on("github.issue.opened")
         async def on_issue_opened(event: Event) -> None:
@@ -201,22 +646,13 @@ Format your response as JSON:
             print(f"🐛 New issue opened: {issue_id}")
             
             # Analyze issue and suggest labels/assignees
-            analysis_prompt = f"""Analyze this GitHub issue:
-
-**Title:** {issue_data['title']}
-**Description:** {issue_data.get('body', 'No description')}
-
-Suggest:
-1. Labels (bug, feature, documentation, etc.)
-2. Priority (low, medium, high, critical)
-3. Whether it needs immediate attention
-
-Format as JSON."""
+            analysis_prompt = ISSUE_ANALYSIS_PROMPT_TEMPLATE.format_map({
+                "title": issue_data["title"],
+                "body": issue_data.get("body") or "No description",
+            })
             
             try:
-                analysis_text = ""
-                async for message in prompt(analysis_prompt, yolo=True):
-                    analysis_text += message.extract_text()
+                analysis_text = await self.cached_prompt(analysis_prompt)
                 
                 print(f"📊 Analysis for {issue_id}:")
                 print(f"   {analysis_text[:200]}...")
@@ -225,8 +661,20 @@ Format as JSON."""
                 print(f"❌ Error analyzing issue {issue_id}: {e}")
     
     def _parse_review(self, text: str) -> dict[str, Any]:
-        """Parse review text into structured format."""
-        # Simplified parsing - in production use proper JSON extraction
+        """Parse review text into structured format.
+        
+        Falls back to a neutral "comment" review when the response holds no
+        JSON object matching REVIEW_SCHEMA.
+        """
+        match = _JSON_SPAN.search(text.encode("utf-8"))
+        if match:
+            try:
+                review = orjson.loads(match.group(0))
+            except orjson.JSONDecodeError:
+                review = None
+            if _REVIEW_VALIDATOR.is_valid(review):
+                return review
+        
         return {
             "summary": text[:200],
             "quality_score": 7,
@@ -277,40 +725,31 @@ Format as JSON."""
         }
 
 
-class WebhookHandler(BaseHTTPRequestHandler):
-    """HTTP handler for GitHub webhooks."""
-    
-    bot: GitHubBot | None = None
+def create_webhook_app(bot: GitHubBot) -> web.Application:
+    """Build the aiohttp application serving GitHub webhooks."""
+    # Keep references to in-flight webhook tasks so they aren't garbage collected
+    tasks: set[asyncio.Task[None]] = set()
     
-    def do_POST(self) -> None:
+    async def webhook(request: web.Request) -> web.Response:
         """Handle POST request (GitHub webhook)."""
-        if self.path != "/webhook":
-            self.send_error(404)
-            return
+        try:
+            payload = orjson.loads(await request.read())
+        except orjson.JSONDecodeError:
+            raise web.HTTPBadRequest(text="Invalid JSON") from None
         
-        # Read body
-        content_length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(content_length)
+        event_type = request.headers.get("X-GitHub-Event", "unknown")
+        print(f"📥 Received {event_type} webhook")
         
-        try:
-            payload = json.loads(body)
-            event_type = self.headers.get("X-GitHub-Event", "unknown")
-            
-            print(f"📥 Received {event_type} webhook")
-            
-            # Process asynchronously
-            if self.bot:
-                asyncio.create_task(self.bot.handle_webhook(event_type, payload))
-            
-            self.send_response(200)
-            self.end_headers()
-            
-        except json.JSONDecodeError:
-            self.send_error(400, "Invalid JSON")
+        # Process asynchronously so GitHub gets its response right away
+        task = asyncio.create_task(bot.handle_webhook(event_type, payload))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        
+        return web.Response(status=200)
     
-    def log_message(self, format: str, *args) -> None:
-        """Suppress default logging."""
-        pass
+    app = web.Application()
+    app.router.add_post("/webhook", webhook)
+    return app
 
 
 async def simulate_events(bot: GitHubBot) -> None:
@@ -366,27 +805,40 @@ async def main() -> int:
     if args.simulate:
         # Run simulation
         await simulate_events(bot)
+        await bot.wait_idle()
         
         # Show final state
         print("\n📊 Final State:")
         for key in await bot.state.list("pr:"):
-            pr_data = await bot.state.get(key)
-            print(f"   {key}: {pr_data.get('status', 'unknown')}")
+            context = PRContext.from_state(await bot.state.get(key))
+            if not context:
+                print(f"   {key}: unknown")
+                continue
+            reviewed = ""
+            if context.review_comments and "timestamp_ns" in context.review_comments[-1]:
+                last_ns = context.review_comments[-1]["timestamp_ns"]
+                reviewed = f" (last review {format_timestamp_ns(last_ns)})"
+            print(f"   {key}: {context.status}{reviewed}")
         
+        await bot.close()
     else:
-        # Run webhook server
-        WebhookHandler.bot = bot
-        server = HTTPServer(("", args.port), WebhookHandler)
+        # Run webhook server on the same event loop as the bot
+        runner = web.AppRunner(create_webhook_app(bot))
+        await runner.setup()
+        site = web.TCPSite(runner, port=args.port)
+        await site.start()
         
         print(f"🚀 GitHub Bot listening on port {args.port}")
         print(f"   Webhook URL: http://localhost:{args.port}/webhook")
         print("   Press Ctrl+C to stop\n")
         
         try:
-            server.serve_forever()
-        except KeyboardInterrupt:
+            await asyncio.Event().wait()
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\n👋 Shutting down...")
-            server.shutdown()
+        finally:
+            await runner.cleanup()
+            await bot.close()
     
     return 0
 
@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 import asyncio
-import base64
+import contextlib
 import json
 import posixpath
-import shlex
+import time
 from collections.abc import AsyncGenerator, Iterable
+from fnmatch import fnmatchcase
+from functools import lru_cache
 from pathlib import PurePosixPath
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
 import boxlite
+import orjson
 from kaos import AsyncReadable, AsyncWritable, Kaos, KaosProcess, StatResult, StrOrKaosPath
 from kaos.path import KaosPath
 
@@ -19,6 +22,37 @@ if TYPE_CHECKING:
         _: Kaos = boxlite_kaos
 
 
+# Keyed on the cwd as well as the path, so chdir needs no invalidation.
+@lru_cache(maxsize=2048)
+def _norm_join(cwd: str, raw: str) -> str:
+    if posixpath.isabs(raw):
+        return posixpath.normpath(raw)
+    return posixpath.normpath(posixpath.join(cwd, raw))
+
+
+def _is_normalized_abs(raw: str) -> bool:
+    """Cheap check for an absolute path that normpath would return unchanged."""
+    return raw[:1] == "/" and "//" not in raw and "/." not in raw and (raw[-1] != "/" or raw == "/")
+
+
+_cached_normpath = lru_cache(maxsize=2048)(posixpath.normpath)
+
+
+def _json_loads(data: bytes) -> Any:
+    # The in-box helpers use json.dumps, which escapes non-UTF-8 file names as lone
+    # surrogates ("\udcff"). orjson rejects those, so fall back to json for them.
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
+
+
+def _chunk_bytes(chunk: object) -> bytes | bytearray | memoryview:
+    if type(chunk) is bytes or isinstance(chunk, (bytearray, memoryview)):
+        return chunk
+    return str(chunk).encode("utf-8", "replace")
+
+
 class _BoxliteStdin:
     def __init__(self, stdin: boxlite.ExecStdin) -> None:
         self._stdin = stdin
@@ -52,19 +86,115 @@ class _BoxliteStdin:
         self.close()
 
 
+class _BoxliteStream:
+    """
+    AsyncReadable view of a boxlite output generator.
+
+    Chunks are pulled on demand; only what a read leaves over is buffered.
+    """
+
+    def __init__(self, stream: AsyncGenerator[bytes]) -> None:
+        self._stream = stream
+        self._buffer = bytearray()
+        self._eof = False
+
+    def __aiter__(self) -> _BoxliteStream:
+        return self
+
+    async def __anext__(self) -> bytes:
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+    def at_eof(self) -> bool:
+        return self._eof and not self._buffer
+
+    def feed_data(self, data: bytes) -> None:
+        self._buffer.extend(data)
+
+    def feed_eof(self) -> None:
+        self._eof = True
+
+    async def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            # Collect the rest as separate chunks and join once, instead of
+            # regrowing the buffer for every chunk of a multi-MB output.
+            chunks = [self._take(len(self._buffer))]
+            while (chunk := await self._next_chunk()) is not None:
+                chunks.append(chunk)
+            return b"".join(chunks)
+        if not self._buffer:
+            chunk = await self._next_chunk()
+            if chunk is None:
+                return b""
+            if len(chunk) <= n:
+                return bytes(chunk)
+            self._buffer.extend(chunk)
+        return self._take(min(n, len(self._buffer)))
+
+    async def readline(self) -> bytes:
+        try:
+            return await self.readuntil(b"\n")
+        except asyncio.IncompleteReadError as exc:
+            return exc.partial
+
+    async def readexactly(self, n: int) -> bytes:
+        while len(self._buffer) < n:
+            if not await self._fill():
+                raise asyncio.IncompleteReadError(self._take(len(self._buffer)), n)
+        return self._take(n)
+
+    async def readuntil(self, separator: bytes = b"\n") -> bytes:
+        start = 0
+        while True:
+            index = self._buffer.find(separator, start)
+            if index >= 0:
+                return self._take(index + len(separator))
+            start = max(0, len(self._buffer) - len(separator) + 1)
+            if not await self._fill():
+                raise asyncio.IncompleteReadError(self._take(len(self._buffer)), None)
+
+    def _take(self, n: int) -> bytes:
+        if n == len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            return data
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
+
+    async def _fill(self) -> bool:
+        chunk = await self._next_chunk()
+        if chunk is None:
+            return False
+        self._buffer.extend(chunk)
+        return True
+
+    async def _next_chunk(self) -> bytes | bytearray | memoryview | None:
+        if self._eof:
+            return None
+        try:
+            return _chunk_bytes(await anext(self._stream))
+        except StopAsyncIteration:
+            self._eof = True
+            return None
+        except Exception as exc:
+            self._eof = True
+            return f"[boxlite stream error] {exc}\n".encode("utf-8", "replace")
+
+
 class _BoxliteProcess:
     def __init__(self, execution: boxlite.Execution) -> None:
         self._execution = execution
-        self._stdout = asyncio.StreamReader()
-        self._stderr = asyncio.StreamReader()
+        self._stdout = _BoxliteStream(execution.stdout())
+        self._stderr = _BoxliteStream(execution.stderr())
         self._stdin = _BoxliteStdin(execution.stdin())
         self.stdin: AsyncWritable = self._stdin
         self.stdout: AsyncReadable = self._stdout
         self.stderr: AsyncReadable = self._stderr
         self._returncode: int | None = None
         self._exit_future: asyncio.Future[int] = asyncio.get_running_loop().create_future()
-        self._stdout_task = asyncio.create_task(self._pipe_stream(execution.stdout(), self._stdout))
-        self._stderr_task = asyncio.create_task(self._pipe_stream(execution.stderr(), self._stderr))
         self._monitor_task = asyncio.create_task(self._monitor())
 
     @property
@@ -81,20 +211,6 @@ class _BoxliteProcess:
     async def kill(self) -> None:
         await self._execution.kill()
 
-    async def _pipe_stream(
-        self, stream: AsyncGenerator[bytes], reader: asyncio.StreamReader
-    ) -> None:
-        try:
-            async for chunk in stream:
-                if isinstance(chunk, (bytes, bytearray)):
-                    reader.feed_data(bytes(chunk))
-                else:
-                    reader.feed_data(str(chunk).encode("utf-8", "replace"))
-        except Exception as exc:
-            reader.feed_data(f"[boxlite stream error] {exc}\n".encode("utf-8", "replace"))
-        finally:
-            reader.feed_eof()
-
     async def _monitor(self) -> None:
         exit_code = 1
         try:
@@ -104,7 +220,6 @@ class _BoxliteProcess:
             self._stderr.feed_data(f"[boxlite command error] {exc}\n".encode("utf-8", "replace"))
         finally:
             self._returncode = exit_code
-            await asyncio.gather(self._stdout_task, self._stderr_task, return_exceptions=True)
             if not self._exit_future.done():
                 self._exit_future.set_result(exit_code)
 
@@ -128,12 +243,24 @@ class BoxliteKaos:
         self._box = box
         self._home_dir = posixpath.normpath(home_dir)
         self._cwd = posixpath.normpath(cwd) if cwd is not None else self._home_dir
+        self._worker: _BoxliteProcess | None = None
+        self._worker_lock = asyncio.Lock()
+        # abs dir path -> (expiry on the monotonic clock, entries)
+        self._listings: dict[str, tuple[float, list[str]]] = {}
+
+    async def close(self) -> None:
+        """Stop the helper worker running inside the box, if any."""
+        async with self._worker_lock:
+            worker, self._worker = self._worker, None
+            if worker is not None and worker.returncode is None:
+                worker.stdin.close()
+                await worker.wait()
 
     def pathclass(self) -> type[PurePosixPath]:
         return PurePosixPath
 
     def normpath(self, path: StrOrKaosPath) -> KaosPath:
-        return KaosPath(posixpath.normpath(str(path)))
+        return KaosPath(_cached_normpath(str(path)))
 
     def gethome(self) -> KaosPath:
         return KaosPath(self._home_dir)
@@ -143,22 +270,7 @@ class BoxliteKaos:
 
     async def chdir(self, path: StrOrKaosPath) -> None:
         abs_path = self._abs_path(path)
-        payload = await self._python_json(
-            """
-import json
-import os
-import sys
-
-path = sys.argv[1]
-if not os.path.exists(path):
-    print(json.dumps({"ok": False, "error": "not_found"}))
-elif not os.path.isdir(path):
-    print(json.dumps({"ok": False, "error": "not_dir"}))
-else:
-    print(json.dumps({"ok": True}))
-""",
-            [abs_path],
-        )
+        payload = await self._rpc("chdir", path=abs_path)
         if not payload.get("ok"):
             self._raise_path_error(payload, abs_path)
         self._cwd = abs_path
@@ -167,33 +279,7 @@ else:
         if not follow_symlinks:
             raise NotImplementedError("BoxliteKaos.stat does not support follow_symlinks=False")
         abs_path = self._abs_path(path)
-        payload = await self._python_json(
-            """
-import json
-import os
-import sys
-
-path = sys.argv[1]
-try:
-    st = os.stat(path)
-    data = {
-        "st_mode": st.st_mode,
-        "st_ino": st.st_ino,
-        "st_dev": st.st_dev,
-        "st_nlink": st.st_nlink,
-        "st_uid": st.st_uid,
-        "st_gid": st.st_gid,
-        "st_size": st.st_size,
-        "st_atime": st.st_atime,
-        "st_mtime": st.st_mtime,
-        "st_ctime": st.st_ctime,
-    }
-    print(json.dumps({"ok": True, "data": data}))
-except FileNotFoundError:
-    print(json.dumps({"ok": False, "error": "not_found"}))
-""",
-            [abs_path],
-        )
+        payload = await self._rpc("stat", path=abs_path)
         if not payload.get("ok"):
             self._raise_path_error(payload, abs_path)
         data = payload["data"]
@@ -211,27 +297,7 @@ except FileNotFoundError:
         )
 
     async def iterdir(self, path: StrOrKaosPath) -> AsyncGenerator[KaosPath]:
-        abs_path = self._abs_path(path)
-        payload = await self._python_json(
-            """
-import json
-import os
-import sys
-
-path = sys.argv[1]
-if not os.path.exists(path):
-    print(json.dumps({"ok": False, "error": "not_found"}))
-elif not os.path.isdir(path):
-    print(json.dumps({"ok": False, "error": "not_dir"}))
-else:
-    entries = [os.path.join(path, entry) for entry in os.listdir(path)]
-    print(json.dumps({"ok": True, "entries": entries}))
-""",
-            [abs_path],
-        )
-        if not payload.get("ok"):
-            self._raise_path_error(payload, abs_path)
-        for entry in payload["entries"]:
+        for entry in await self._list_dir(self._abs_path(path)):
             yield KaosPath(entry)
 
     async def glob(
@@ -239,56 +305,16 @@ else:
     ) -> AsyncGenerator[KaosPath]:
         if not case_sensitive:
             raise ValueError("Case insensitive glob is not supported in current environment")
-        abs_path = self._abs_path(path)
-        payload = await self._python_json(
-            """
-import json
-import os
-import sys
-from fnmatch import fnmatchcase
-
-path = sys.argv[1]
-pattern = sys.argv[2]
-if not os.path.exists(path):
-    print(json.dumps({"ok": False, "error": "not_found"}))
-elif not os.path.isdir(path):
-    print(json.dumps({"ok": False, "error": "not_dir"}))
-else:
-    entries = []
-    for entry in os.listdir(path):
-        if fnmatchcase(entry, pattern):
-            entries.append(os.path.join(path, entry))
-    print(json.dumps({"ok": True, "entries": entries}))
-""",
-            [abs_path, pattern],
-        )
-        if not payload.get("ok"):
-            self._raise_path_error(payload, abs_path)
-        for entry in payload["entries"]:
-            yield KaosPath(entry)
+        for entry in await self._list_dir(self._abs_path(path)):
+            if fnmatchcase(posixpath.basename(entry), pattern):
+                yield KaosPath(entry)
 
     async def readbytes(self, path: StrOrKaosPath, n: int | None = None) -> bytes:
         abs_path = self._abs_path(path)
-        payload = await self._python_json(
-            """
-import base64
-import json
-import sys
-
-path = sys.argv[1]
-try:
-    with open(path, "rb") as f:
-        data = f.read()
-    print(json.dumps({"ok": True, "data": base64.b64encode(data).decode("ascii")}))
-except FileNotFoundError:
-    print(json.dumps({"ok": False, "error": "not_found"}))
-""",
-            [abs_path],
-        )
+        payload, data = await self._rpc_data("read", path=abs_path, n=n)
         if not payload.get("ok"):
             self._raise_path_error(payload, abs_path)
-        raw = base64.b64decode(payload["data"])
-        return raw if n is None else raw[:n]
+        return data
 
     async def readtext(
         self,
@@ -307,14 +333,38 @@ except FileNotFoundError:
         encoding: str = "utf-8",
         errors: Literal["strict", "ignore", "replace"] = "strict",
     ) -> AsyncGenerator[str]:
-        text = await self.readtext(path, encoding=encoding, errors=errors)
-        for line in text.splitlines(keepends=True):
-            yield line
+        abs_path = self._abs_path(path)
+        # Lines are decoded inside the box and streamed back one frame at a time, so a
+        # caller that stops early never pulls the rest of the file.
+        execution = await self._box.exec(
+            "python", ["-c", _READLINES_CODE, abs_path, encoding, errors]
+        )
+        process = _BoxliteProcess(execution)
+        try:
+            while True:
+                try:
+                    header = await process.stdout.readexactly(4)
+                except asyncio.IncompleteReadError as exc:
+                    if exc.partial:
+                        raise RuntimeError(f"Truncated line stream for {abs_path}") from None
+                    break
+                line = await process.stdout.readexactly(int.from_bytes(header, "big"))
+                yield line.decode("utf-8")
+            if await process.wait() != 0:
+                stderr = await process.stderr.read()
+                try:
+                    payload = _json_loads(stderr)
+                except ValueError:
+                    message = stderr.decode("utf-8", "replace").strip()
+                    payload = {"ok": False, "error": "failed", "message": message}
+                self._raise_path_error(payload, abs_path)
+        finally:
+            if process.returncode is None:
+                await process.kill()
 
     async def writebytes(self, path: StrOrKaosPath, data: bytes) -> int:
         abs_path = self._abs_path(path)
-        payload = base64.b64encode(data)
-        await self._python_write(abs_path, payload, append=False)
+        await self._write(abs_path, data, append=False)
         return len(data)
 
     async def writetext(
@@ -327,49 +377,16 @@ except FileNotFoundError:
         errors: Literal["strict", "ignore", "replace"] = "strict",
     ) -> int:
         payload = data.encode(encoding, errors=errors)
-        await self._python_write(
-            self._abs_path(path),
-            base64.b64encode(payload),
-            append=(mode == "a"),
-        )
+        await self._write(self._abs_path(path), payload, append=(mode == "a"))
         return len(data)
 
     async def mkdir(
         self, path: StrOrKaosPath, parents: bool = False, exist_ok: bool = False
     ) -> None:
         abs_path = self._abs_path(path)
-        payload = await self._python_json(
-            """
-import json
-import os
-import sys
-
-path = sys.argv[1]
-parents = sys.argv[2] == "1"
-exist_ok = sys.argv[3] == "1"
-if os.path.exists(path):
-    if not exist_ok:
-        print(json.dumps({"ok": False, "error": "exists"}))
-    elif not os.path.isdir(path):
-        print(json.dumps({"ok": False, "error": "exists_not_dir"}))
-    else:
-        print(json.dumps({"ok": True}))
-else:
-    if not parents:
-        parent = os.path.dirname(path) or "/"
-        if not os.path.exists(parent):
-            print(json.dumps({"ok": False, "error": "parent_missing"}))
-        elif not os.path.isdir(parent):
-            print(json.dumps({"ok": False, "error": "parent_not_dir"}))
-        else:
-            os.mkdir(path)
-            print(json.dumps({"ok": True}))
-    else:
-        os.makedirs(path, exist_ok=exist_ok)
-        print(json.dumps({"ok": True}))
-""",
-            [abs_path, "1" if parents else "0", "1" if exist_ok else "0"],
-        )
+        payload = await self._rpc("mkdir", path=abs_path, parents=parents, exist_ok=exist_ok)
+        # parents=True may have created several levels, so drop every listing
+        self._listings.clear()
         if not payload.get("ok"):
             error = payload.get("error")
             if error in {"exists", "exists_not_dir"}:
@@ -387,10 +404,10 @@ else:
     async def exec(self, *args: str) -> KaosProcess:
         if not args:
             raise ValueError("At least one argument (the program to execute) is required.")
-        command = " ".join(shlex.quote(arg) for arg in args)
-        if self._cwd:
-            command = f"cd {shlex.quote(self._cwd)} && {command}"
-        execution = await self._box.exec("sh", ["-c", command])
+        # The command may change any part of the filesystem
+        self._listings.clear()
+        # Run the program directly in the cwd rather than through a `cd ... &&` shell
+        execution = await self._box.exec(args[0], list(args[1:]), cwd=self._cwd)
         return _BoxliteProcess(execution)
 
     async def _exec_capture(
@@ -402,56 +419,116 @@ else:
             writer.send_input(stdin)
             writer.close()
 
-        stdout_task = asyncio.create_task(self._collect_stream(execution.stdout()))
-        stderr_task = asyncio.create_task(self._collect_stream(execution.stderr()))
-        result = await execution.wait()
-        stdout, stderr = await asyncio.gather(stdout_task, stderr_task)
+        stdout, stderr, result = await asyncio.gather(
+            self._collect_stream(execution.stdout()),
+            self._collect_stream(execution.stderr()),
+            execution.wait(),
+        )
         return stdout, stderr, result.exit_code
 
     async def _collect_stream(self, stream: AsyncGenerator[bytes]) -> bytes:
         data = bytearray()
         async for chunk in stream:
-            if isinstance(chunk, (bytes, bytearray)):
-                data.extend(chunk)
-            else:
-                data.extend(str(chunk).encode("utf-8", "replace"))
+            data.extend(_chunk_bytes(chunk))
         return bytes(data)
 
-    async def _python_json(self, code: str, args: list[str]) -> dict[str, object]:
-        stdout, stderr, exit_code = await self._exec_capture("python", ["-c", code, *args])
+    async def _list_dir(self, abs_path: str) -> list[str]:
+        # Listings are reused for a short while so that iterdir followed by several
+        # globs on the same directory costs a single round trip.
+        now = time.monotonic()
+        cached = self._listings.get(abs_path)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        payload = await self._rpc("ls", path=abs_path)
+        if not payload.get("ok"):
+            self._raise_path_error(payload, abs_path)
+        entries = payload["entries"]
+        if len(self._listings) >= _LISTING_CACHE_SIZE:
+            self._listings = {key: value for key, value in self._listings.items() if value[0] > now}
+        self._listings[abs_path] = (now + _LISTING_TTL, entries)
+        return entries
+
+    async def _write(self, path: str, data: bytes, *, append: bool) -> None:
+        self._listings.pop(posixpath.dirname(path), None)
+        payload, _ = await self._rpc_data("write", data, path=path, append=append)
+        if not payload.get("ok"):
+            self._raise_path_error(payload, path)
+
+    async def _rpc(self, op: str, **args: object) -> dict[str, object]:
+        payload, _ = await self._rpc_data(op, **args)
+        return payload
+
+    async def _rpc_data(
+        self, op: str, data: bytes = b"", /, **args: object
+    ) -> tuple[dict[str, object], bytes]:
+        body = orjson.dumps({"op": op, "args": args})
+        header = b"%d %d\n" % (len(body), len(data))
+        async with self._worker_lock:
+            worker = await self._ensure_worker()
+            if worker is not None:
+                try:
+                    worker.stdin.writelines((header, body, data))
+                    sizes = (await worker.stdout.readline()).split()
+                    response = await worker.stdout.readexactly(int(sizes[0]))
+                    result = await worker.stdout.readexactly(int(sizes[1]))
+                    return self._decode_response(response), result
+                except BaseException as exc:
+                    # Whatever interrupted the request (a dead worker, a cancelled caller)
+                    # may have left its response unread, and the next request would read
+                    # it instead of its own. Drop the worker so the next call respawns one.
+                    self._worker = None
+                    with contextlib.suppress(Exception):
+                        await worker.kill()
+                    if not isinstance(exc, (asyncio.IncompleteReadError, IndexError, ValueError)):
+                        raise
+                    if op == "write" and args.get("append"):
+                        # The append may already have been applied; retrying could duplicate it.
+                        raise RuntimeError("BoxliteKaos worker exited during append") from None
+        return await self._rpc_oneshot(header + body + data)
+
+    async def _rpc_oneshot(self, frame: bytes) -> tuple[dict[str, object], bytes]:
+        # The worker serves a single request and exits when stdin hits EOF.
+        stdout, stderr, exit_code = await self._exec_capture(
+            "python", ["-c", _WORKER_CODE], stdin=frame
+        )
         if exit_code != 0:
             message = stderr.decode("utf-8", "replace").strip()
             raise RuntimeError(message or "BoxliteKaos python helper failed")
+        header, _, rest = stdout.partition(b"\n")
         try:
-            return json.loads(stdout.decode("utf-8"))
-        except json.JSONDecodeError as exc:
-            raise RuntimeError(f"Invalid JSON response: {stdout!r}") from exc
-
-    async def _python_write(self, path: str, payload: bytes, *, append: bool) -> None:
-        code = """
-import base64
-import sys
+            json_len, data_len = (int(size) for size in header.split())
+        except ValueError as exc:
+            raise RuntimeError(f"Invalid worker response: {stdout!r}") from exc
+        return self._decode_response(rest[:json_len]), rest[json_len : json_len + data_len]
+
+    async def _ensure_worker(self) -> _BoxliteProcess | None:
+        if self._worker is not None and self._worker.returncode is None:
+            return self._worker
+        try:
+            execution = await self._box.exec("python", ["-u", "-c", _WORKER_CODE])
+        except Exception:
+            self._worker = None
+            return None
+        self._worker = _BoxliteProcess(execution)
+        return self._worker
 
-path = sys.argv[1]
-mode = "ab" if sys.argv[2] == "1" else "wb"
-data = base64.b64decode(sys.stdin.buffer.read())
-with open(path, mode) as f:
-    f.write(data)
-"""
-        _, stderr, exit_code = await self._exec_capture(
-            "python",
-            ["-c", code, path, "1" if append else "0"],
-            stdin=payload,
-        )
-        if exit_code != 0:
-            message = stderr.decode("utf-8", "replace").strip()
-            raise RuntimeError(message or f"Failed to write {path}")
+    @staticmethod
+    def _decode_response(response: bytes) -> dict[str, object]:
+        try:
+            return _json_loads(response)
+        except ValueError as exc:
+            raise RuntimeError(f"Invalid JSON response: {response!r}") from exc
 
     def _abs_path(self, path: StrOrKaosPath) -> str:
         raw = str(path)
-        if posixpath.isabs(raw):
-            return posixpath.normpath(raw)
-        return posixpath.normpath(posixpath.join(self._cwd, raw))
+        if _is_normalized_abs(raw):
+            return raw
+        if raw[:1] != "/":
+            # cwd is normalized, so plain concatenation is enough for simple relative paths.
+            joined = f"{self._cwd}/{raw}"
+            if _is_normalized_abs(joined):
+                return joined
+        return _norm_join(self._cwd, raw)
 
     @staticmethod
     def _raise_path_error(payload: dict[str, object], path: str) -> None:
@@ -462,4 +539,147 @@ with open(path, mode) as f:
             raise NotADirectoryError(f"{path} is not a directory")
         if error == "exists":
             raise FileExistsError(f"{path} already exists")
+        message = payload.get("message")
+        if message:
+            raise RuntimeError(f"BoxliteKaos operation failed for {path}: {message}")
         raise RuntimeError(f"BoxliteKaos operation failed for {path}")
+
+
+# Seconds a directory listing is reused by iterdir/glob, and how many are kept.
+_LISTING_TTL = 1.0
+_LISTING_CACHE_SIZE = 256
+
+# Request/response loop run inside the box. Each frame is an ASCII "<json_len> <data_len>" line,
+# the JSON body, then raw file bytes. With a single frame on stdin it doubles as a one-shot helper.
+_WORKER_CODE = r"""
+import json
+import os
+import sys
+
+
+def op_chdir(path):
+    if not os.path.exists(path):
+        return {"ok": False, "error": "not_found"}
+    if not os.path.isdir(path):
+        return {"ok": False, "error": "not_dir"}
+    return {"ok": True}
+
+
+def op_stat(path):
+    st = os.stat(path)
+    data = {
+        "st_mode": st.st_mode,
+        "st_ino": st.st_ino,
+        "st_dev": st.st_dev,
+        "st_nlink": st.st_nlink,
+        "st_uid": st.st_uid,
+        "st_gid": st.st_gid,
+        "st_size": st.st_size,
+        "st_atime": st.st_atime,
+        "st_mtime": st.st_mtime,
+        "st_ctime": st.st_ctime,
+    }
+    return {"ok": True, "data": data}
+
+
+def op_ls(path):
+    if not os.path.exists(path):
+        return {"ok": False, "error": "not_found"}
+    if not os.path.isdir(path):
+        return {"ok": False, "error": "not_dir"}
+    entries = [os.path.join(path, entry) for entry in os.listdir(path)]
+    return {"ok": True, "entries": entries}
+
+
+def op_read(path, n=None):
+    with open(path, "rb") as f:
+        data = f.read(-1 if n is None else n)
+    return {"ok": True}, data
+
+
+def op_write(path, append, data=b""):
+    with open(path, "ab" if append else "wb") as f:
+        f.write(data)
+    return {"ok": True}
+
+
+def op_mkdir(path, parents, exist_ok):
+    if os.path.exists(path):
+        if not exist_ok:
+            return {"ok": False, "error": "exists"}
+        if not os.path.isdir(path):
+            return {"ok": False, "error": "exists_not_dir"}
+        return {"ok": True}
+    if parents:
+        os.makedirs(path, exist_ok=exist_ok)
+        return {"ok": True}
+    parent = os.path.dirname(path) or "/"
+    if not os.path.exists(parent):
+        return {"ok": False, "error": "parent_missing"}
+    if not os.path.isdir(parent):
+        return {"ok": False, "error": "parent_not_dir"}
+    os.mkdir(path)
+    return {"ok": True}
+
+
+OPS = {
+    "chdir": op_chdir,
+    "stat": op_stat,
+    "ls": op_ls,
+    "read": op_read,
+    "write": op_write,
+    "mkdir": op_mkdir,
+}
+
+
+def handle(request, data):
+    args = request["args"]
+    if data:
+        args["data"] = data
+    try:
+        result = OPS[request["op"]](**args)
+    except FileNotFoundError:
+        return {"ok": False, "error": "not_found"}, b""
+    except Exception as exc:
+        return {"ok": False, "error": "failed", "message": f"{type(exc).__name__}: {exc}"}, b""
+    return result if isinstance(result, tuple) else (result, b"")
+
+
+stdin = sys.stdin.buffer
+stdout = sys.stdout.buffer
+while True:
+    header = stdin.readline()
+    if not header:
+        break
+    json_len, data_len = (int(size) for size in header.split())
+    request = json.loads(stdin.read(json_len))
+    response, data = handle(request, stdin.read(data_len))
+    body = json.dumps(response).encode("utf-8")
+    stdout.write(b"%d %d\n" % (len(body), len(data)))
+    stdout.write(body)
+    stdout.write(data)
+    stdout.flush()
+"""
+
+
+# Streams a text file as frames of a 4-byte big-endian length plus the UTF-8 encoded line.
+# Line endings are kept as-is; errors are reported as JSON on stderr with exit status 1.
+_READLINES_CODE = r"""
+import json
+import sys
+
+path, encoding, errors = sys.argv[1:4]
+out = sys.stdout.buffer
+try:
+    with open(path, encoding=encoding, errors=errors, newline="") as f:
+        for line in f:
+            data = line.encode("utf-8")
+            out.write(len(data).to_bytes(4, "big") + data)
+except FileNotFoundError:
+    sys.stderr.write(json.dumps({"ok": False, "error": "not_found"}))
+    sys.exit(1)
+except Exception as exc:
+    message = f"{type(exc).__name__}: {exc}"
+    sys.stderr.write(json.dumps({"ok": False, "error": "failed", "message": message}))
+    sys.exit(1)
+"""
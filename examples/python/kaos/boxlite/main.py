@@ -48,6 +48,7 @@ async def main() -> None:
         print("─" * 60)
     finally:
         reset_current_kaos(token)
+        await boxlite_kaos.close()
         await box.stop()
 
 
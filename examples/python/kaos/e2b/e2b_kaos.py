@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 import asyncio
+import codecs
 import posixpath
+import re
 import shlex
 import stat
-from collections.abc import AsyncGenerator, Iterable
+import time
+import uuid
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Iterable
 from datetime import datetime
+from fnmatch import translate
+from functools import lru_cache
 from pathlib import PurePosixPath
 from typing import TYPE_CHECKING, Literal
 
@@ -31,14 +38,43 @@ if TYPE_CHECKING:
         _: Kaos = e2b_kaos
 
 
+# Keyed on the cwd as well as the path, so chdir needs no invalidation.
+@lru_cache(maxsize=2048)
+def _norm_join(cwd: str, raw: str) -> str:
+    if posixpath.isabs(raw):
+        return posixpath.normpath(raw)
+    return posixpath.normpath(posixpath.join(cwd, raw))
+
+
+def _is_normalized_abs(raw: str) -> bool:
+    """Cheap check for an absolute path that normpath would return unchanged."""
+    return raw[:1] == "/" and "//" not in raw and "/." not in raw and (raw[-1] != "/" or raw == "/")
+
+
+@lru_cache(maxsize=256)
+def _compile_glob(pattern: str) -> re.Pattern[str]:
+    """Case-sensitive matcher for a glob pattern, compiled once per pattern."""
+    return re.compile(translate(pattern))
+
+
 class _E2BStdin:
+    """
+    Stdin writer that coalesces queued writes into as few `send_stdin` RPCs as possible.
+
+    A single sender task drains everything queued since its last RPC and sends it as one
+    payload, so many small writes cost one round-trip instead of one each.
+    """
+
     def __init__(self, commands: Commands, pid: int) -> None:
         self._commands = commands
         self._pid = pid
         self._closed = False
         self._eof_sent = False
-        self._lock = asyncio.Lock()
-        self._last_task: asyncio.Task[None] | None = None
+        self._error: Exception | None = None
+        # `None` tells the sender to stop after the payload queued before it.
+        self._queue: asyncio.Queue[bytes | None] = asyncio.Queue()
+        # Started by the first write, so processes that never get input cost no task.
+        self._sender_task: asyncio.Task[None] | None = None
 
     def can_write_eof(self) -> bool:
         return True
@@ -48,8 +84,18 @@ class _E2BStdin:
         self.write_eof()
 
     async def drain(self) -> None:
-        if self._last_task is not None:
-            await self._last_task
+        sender = self._sender_task
+        if sender is not None and not sender.done():
+            # Stop waiting if the sender ends early (aborted), or items it will
+            # never take would keep join() pending forever.
+            joined = asyncio.ensure_future(self._queue.join())
+            try:
+                await asyncio.wait((joined, sender), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                joined.cancel()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
 
     def is_closing(self) -> bool:
         return self._closed
@@ -58,10 +104,9 @@ class _E2BStdin:
         await self.drain()
 
     def write(self, data: bytes) -> None:
-        if self._closed:
+        if self._closed or self._eof_sent:
             return
-        text = data.decode("utf-8", errors="replace")
-        self._last_task = asyncio.create_task(self._send(text))
+        self._enqueue(bytes(data))
 
     def writelines(self, data: Iterable[bytes], /) -> None:
         for chunk in data:
@@ -71,26 +116,226 @@ class _E2BStdin:
         if self._eof_sent:
             return None
         self._eof_sent = True
-        self._last_task = asyncio.create_task(self._send("\x04"))
+        self._enqueue(b"\x04")
+        self._enqueue(None)
         return None
 
-    async def _send(self, text: str) -> None:
-        async with self._lock:
-            await self._commands.send_stdin(self._pid, text)
+    def abort(self) -> None:
+        """Stop sending once the process has exited; pending writes are dropped."""
+        self._closed = True
+        self._eof_sent = True  # Nothing, not even EOF, is sent from now on
+        if self._sender_task is not None:
+            self._sender_task.cancel()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+
+    def _enqueue(self, item: bytes | None) -> None:
+        self._queue.put_nowait(item)
+        if self._sender_task is None:
+            self._sender_task = asyncio.create_task(self._sender())
+
+    async def _sender(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            payload = b"".join(chunk for chunk in batch if chunk is not None)
+            try:
+                if payload:
+                    await self._commands.send_stdin(self._pid, payload)
+            except Exception as exc:
+                self._error = exc
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                return
+
+
+class _E2BStream:
+    """
+    AsyncReadable fed by the e2b output callbacks.
+
+    Chunks are kept as they arrive and only sliced or joined when a read needs them,
+    instead of being copied into one growing buffer on every callback.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: deque[bytes] = deque()
+        self._offset = 0  # Bytes of the first chunk already read
+        self._size = 0
+        self._scanned = 0  # Leading bytes already searched for a separator
+        self._eof = False
+        self._waiter: asyncio.Future[None] | None = None
+
+    def __aiter__(self) -> _E2BStream:
+        return self
+
+    async def __anext__(self) -> bytes:
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+    def at_eof(self) -> bool:
+        return self._eof and not self._size
+
+    def feed_data(self, data: bytes) -> None:
+        if data:
+            self._chunks.append(data)
+            self._size += len(data)
+            self._wake()
+
+    def feed_eof(self) -> None:
+        self._eof = True
+        self._wake()
+
+    async def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            while not self._eof:
+                await self._wait()
+            return self._take(self._size)
+        if n == 0:
+            return b""
+        while not self._size and not self._eof:
+            await self._wait()
+        return self._take(min(n, self._size))
+
+    async def readline(self) -> bytes:
+        try:
+            return await self.readuntil(b"\n")
+        except asyncio.IncompleteReadError as exc:
+            return exc.partial
+
+    async def readexactly(self, n: int) -> bytes:
+        while self._size < n:
+            if self._eof:
+                raise asyncio.IncompleteReadError(self._take(self._size), n)
+            await self._wait()
+        return self._take(n)
+
+    async def readuntil(self, separator: bytes = b"\n") -> bytes:
+        # A cancelled earlier call may have scanned for a different separator.
+        self._scanned = 0
+        while True:
+            end = self._find(separator)
+            if end >= 0:
+                return self._take(end)
+            if self._eof:
+                raise asyncio.IncompleteReadError(self._take(self._size), None)
+            await self._wait()
+
+    def _find(self, separator: bytes) -> int:
+        """Length of the data up to and including `separator`, or -1 if it is not buffered."""
+        if len(separator) > 1 and len(self._chunks) > 1:
+            # Multi-byte separators may straddle chunks; search one contiguous chunk.
+            head = self._chunks.popleft()[self._offset :]
+            self._chunks = deque([b"".join([head, *self._chunks])])
+            self._offset = 0
+        position = 0  # Offset of the current chunk's unread data from the read position
+        for i, chunk in enumerate(self._chunks):
+            base = self._offset if i == 0 else 0
+            length = len(chunk) - base
+            if position + length > self._scanned:
+                skip = max(0, self._scanned - position - len(separator) + 1)
+                index = chunk.find(separator, base + skip)
+                if index >= 0:
+                    return position + index - base + len(separator)
+            position += length
+        self._scanned = self._size
+        return -1
+
+    def _take(self, n: int) -> bytes:
+        self._size -= n
+        self._scanned = 0
+        parts: list[bytes] = []
+        while n:
+            chunk = self._chunks[0]
+            available = len(chunk) - self._offset
+            if available > n:
+                parts.append(chunk[self._offset : self._offset + n])
+                self._offset += n
+                break
+            parts.append(chunk[self._offset :] if self._offset else chunk)
+            self._chunks.popleft()
+            self._offset = 0
+            n -= available
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    async def _wait(self) -> None:
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class _OutputCoalescer:
+    """
+    Batches output callback text before it reaches a stream.
+
+    Text is flushed once `chunk_size` characters are pending or `_OUTPUT_FLUSH_DELAY`
+    seconds after the first pending piece, whichever comes first.
+    """
+
+    def __init__(self, stream: _E2BStream, chunk_size: int) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._parts: list[str] = []
+        self._pending = 0
+        self._timer: asyncio.TimerHandle | None = None
+
+    def feed(self, text: str) -> None:
+        if not text:
+            return
+        self._parts.append(text)
+        self._pending += len(text)
+        if self._pending >= self._chunk_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(_OUTPUT_FLUSH_DELAY, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._parts:
+            self._stream.feed_data("".join(self._parts).encode("utf-8", "replace"))
+            self._parts.clear()
+            self._pending = 0
 
 
 class _E2BProcess:
-    def __init__(self, handle: AsyncCommandHandle, commands: Commands) -> None:
+    def __init__(
+        self, handle: AsyncCommandHandle, commands: Commands, output_chunk_size: int
+    ) -> None:
         self._handle = handle
-        self._stdout = asyncio.StreamReader()
-        self._stderr = asyncio.StreamReader()
+        self._stdout = _E2BStream()
+        self._stderr = _E2BStream()
+        self._stdout_coalescer = _OutputCoalescer(self._stdout, output_chunk_size)
+        self._stderr_coalescer = _OutputCoalescer(self._stderr, output_chunk_size)
         self._stdin = _E2BStdin(commands, handle.pid)
         self.stdin: AsyncWritable = self._stdin
-        self.stdout: AsyncReadable = self._stdout
-        self.stderr: AsyncReadable = self._stderr
         self._returncode: int | None = None
         self._exit_future: asyncio.Future[int] = asyncio.get_running_loop().create_future()
-        self._monitor_task = asyncio.create_task(self._monitor())
+        # The exit monitor starts on first use of the process, so fire-and-forget execs that
+        # are never read from or waited on do not keep a task around.
+        self._monitor_task: asyncio.Task[None] | None = None
+
+    @property
+    def stdout(self) -> AsyncReadable:
+        self._ensure_monitor()
+        return self._stdout
+
+    @property
+    def stderr(self) -> AsyncReadable:
+        self._ensure_monitor()
+        return self._stderr
 
     @property
     def pid(self) -> int:
@@ -98,21 +343,26 @@ class _E2BProcess:
 
     @property
     def returncode(self) -> int | None:
+        self._ensure_monitor()
         return self._returncode
 
     async def wait(self) -> int:
+        self._ensure_monitor()
         return await self._exit_future
 
     async def kill(self) -> None:
+        self._ensure_monitor()
         await self._handle.kill()
 
     def feed_stdout(self, chunk: str) -> None:
-        if chunk:
-            self._stdout.feed_data(chunk.encode("utf-8", "replace"))
+        self._stdout_coalescer.feed(chunk)
 
     def feed_stderr(self, chunk: str) -> None:
-        if chunk:
-            self._stderr.feed_data(chunk.encode("utf-8", "replace"))
+        self._stderr_coalescer.feed(chunk)
+
+    def _ensure_monitor(self) -> None:
+        if self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor())
 
     async def _monitor(self) -> None:
         exit_code = 1
@@ -125,6 +375,9 @@ class _E2BProcess:
             self.feed_stderr(f"[e2b command error] {exc}\n")
         finally:
             self._returncode = exit_code
+            self._stdin.abort()
+            self._stdout_coalescer.flush()
+            self._stderr_coalescer.flush()
             self._stdout.feed_eof()
             self._stderr.feed_eof()
             if not self._exit_future.done():
@@ -152,12 +405,16 @@ class E2BKaos:
         cwd: str | None = None,
         user: str | None = None,
         request_timeout: float | None = None,
+        output_chunk_size: int = 16 * 1024,
     ) -> None:
         self._sandbox = sandbox
         self._home_dir = posixpath.normpath(home_dir)
         self._cwd = posixpath.normpath(cwd) if cwd is not None else self._home_dir
         self._user = user
         self._request_timeout = request_timeout
+        self._output_chunk_size = output_chunk_size
+        # abs path -> (expiry, info); None records a path known not to exist
+        self._stat_cache: dict[str, tuple[float, EntryInfo | None]] = {}
 
     def pathclass(self) -> type[PurePosixPath]:
         return PurePosixPath
@@ -173,14 +430,9 @@ class E2BKaos:
 
     async def chdir(self, path: StrOrKaosPath) -> None:
         abs_path = self._abs_path(path)
-        try:
-            info: EntryInfo = await self._sandbox.files.get_info(
-                abs_path,
-                user=self._user,
-                request_timeout=self._request_timeout,
-            )
-        except NotFoundException as exc:
-            raise FileNotFoundError(abs_path) from exc
+        info = await self._get_info(abs_path)
+        if info is None:
+            raise FileNotFoundError(abs_path)
         if info.type != FileType.DIR:
             raise NotADirectoryError(f"{abs_path} is not a directory")
         self._cwd = abs_path
@@ -189,14 +441,9 @@ class E2BKaos:
         if not follow_symlinks:
             raise NotImplementedError("E2BKaos.stat does not support follow_symlinks=False")
         abs_path = self._abs_path(path)
-        try:
-            info: EntryInfo = await self._sandbox.files.get_info(
-                abs_path,
-                user=self._user,
-                request_timeout=self._request_timeout,
-            )
-        except NotFoundException as exc:
-            raise FileNotFoundError(abs_path) from exc
+        info = await self._get_info(abs_path)
+        if info is None:
+            raise FileNotFoundError(abs_path)
         mode = self._with_type_bits(info)
         mtime = self._to_timestamp(info.modified_time)
         return StatResult(
@@ -231,28 +478,52 @@ class E2BKaos:
         if not case_sensitive:
             raise ValueError("Case insensitive glob is not supported in current environment")
         abs_path = self._abs_path(path)
+        if (
+            not _GLOB_MAGIC.search(pattern)
+            and pattern not in ("", ".", "..")
+            and "/" not in pattern
+        ):
+            # A literal name matches at most one entry: probe it instead of listing.
+            entry_path = posixpath.join(abs_path, pattern)
+            if await self._get_info(entry_path) is not None:
+                yield KaosPath(entry_path)
+            return
         entries: list[EntryInfo] = await self._sandbox.files.list(
             abs_path,
             depth=1,
             user=self._user,
             request_timeout=self._request_timeout,
         )
+        match = _compile_glob(pattern).match
         for entry in entries:
             if entry.path == abs_path:
                 continue
-            if self._fnmatch(entry.name, pattern):
+            if match(entry.name):
                 yield KaosPath(entry.path)
 
     async def readbytes(self, path: StrOrKaosPath, n: int | None = None) -> bytes:
         abs_path = self._abs_path(path)
-        data: bytes | bytearray = await self._sandbox.files.read(
-            abs_path,
-            format="bytes",
-            user=self._user,
-            request_timeout=self._request_timeout,
-        )
-        payload = bytes(data)
-        return payload if n is None else payload[:n]
+        if n is not None:
+            buffer = bytearray(n)
+            size = await self._readinto(abs_path, memoryview(buffer))
+            if size < n:
+                del buffer[size:]
+            return bytes(buffer)
+        stream = await self._open_stream(abs_path)
+        try:
+            chunks = [chunk async for chunk in stream]
+        finally:
+            await self._close_stream(stream)
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    async def readinto(self, path: StrOrKaosPath, buffer: memoryview | bytearray) -> int:
+        """
+        Read the start of a file into `buffer`, stopping the download once it is full.
+
+        Returns the number of bytes written, which is less than `len(buffer)` only when
+        the file is shorter.
+        """
+        return await self._readinto(self._abs_path(path), memoryview(buffer).cast("B"))
 
     async def readtext(
         self,
@@ -261,8 +532,15 @@ class E2BKaos:
         encoding: str = "utf-8",
         errors: Literal["strict", "ignore", "replace"] = "strict",
     ) -> str:
-        payload = await self.readbytes(path)
-        return payload.decode(encoding, errors=errors)
+        # Decode chunk by chunk so the raw bytes are never held next to the text.
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+        stream = await self._open_stream(self._abs_path(path))
+        try:
+            parts = [decoder.decode(chunk) async for chunk in stream]
+        finally:
+            await self._close_stream(stream)
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
 
     async def readlines(
         self,
@@ -271,9 +549,25 @@ class E2BKaos:
         encoding: str = "utf-8",
         errors: Literal["strict", "ignore", "replace"] = "strict",
     ) -> AsyncGenerator[str]:
-        text = await self.readtext(path, encoding=encoding, errors=errors)
-        for line in text.splitlines(keepends=True):
-            yield line
+        # Lines are cut from each decoded chunk as it arrives; only the unfinished
+        # tail of the previous chunk is carried over.
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+        carry = ""
+        stream = await self._open_stream(self._abs_path(path))
+        try:
+            async for chunk in stream:
+                text = decoder.decode(chunk)
+                start = 0
+                while (end := text.find("\n", start)) != -1:
+                    yield carry + text[start : end + 1]
+                    carry = ""
+                    start = end + 1
+                carry += text[start:]
+        finally:
+            await self._close_stream(stream)
+        carry += decoder.decode(b"", final=True)
+        if carry:
+            yield carry
 
     async def writebytes(self, path: StrOrKaosPath, data: bytes) -> int:
         abs_path = self._abs_path(path)
@@ -283,6 +577,7 @@ class E2BKaos:
             user=self._user,
             request_timeout=self._request_timeout,
         )
+        self._invalidate(abs_path)
         return len(data)
 
     async def writetext(
@@ -297,20 +592,31 @@ class E2BKaos:
         abs_path = self._abs_path(path)
         payload = data.encode(encoding, errors=errors)
         if mode == "a":
-            payload = await self._read_for_append_bytes(abs_path) + payload
+            await self._append_bytes(abs_path, payload)
+            self._invalidate(abs_path)
+            return len(data)
         await self._sandbox.files.write(  # type: ignore[reportUnknownMemberType]
             abs_path,
             payload,
             user=self._user,
             request_timeout=self._request_timeout,
         )
+        self._invalidate(abs_path)
         return len(data)
 
     async def mkdir(
         self, path: StrOrKaosPath, parents: bool = False, exist_ok: bool = False
     ) -> None:
         abs_path = self._abs_path(path)
-        existing = await self._get_info(abs_path)
+        parent = posixpath.dirname(abs_path) or "/"
+        if parents:
+            # make_dir creates missing parents itself, so only the target is probed.
+            existing = await self._get_info(abs_path)
+            parent_info = None
+        else:
+            existing, parent_info = await asyncio.gather(
+                self._get_info(abs_path), self._get_info(parent)
+            )
         if existing is not None:
             if not exist_ok:
                 raise FileExistsError(f"{abs_path} already exists")
@@ -319,8 +625,6 @@ class E2BKaos:
             return
 
         if not parents:
-            parent = posixpath.dirname(abs_path) or "/"
-            parent_info = await self._get_info(parent)
             if parent_info is None:
                 raise FileNotFoundError(f"Parent directory {parent} does not exist")
             if parent_info.type != FileType.DIR:
@@ -331,11 +635,14 @@ class E2BKaos:
             user=self._user,
             request_timeout=self._request_timeout,
         )
+        self._invalidate(abs_path)
 
     async def exec(self, *args: str) -> KaosProcess:
         if not args:
             raise ValueError("At least one argument (the program to execute) is required.")
-        command = " ".join(shlex.quote(arg) for arg in args)
+        # The command can change anything on the filesystem.
+        self._stat_cache.clear()
+        command = " ".join(arg if _SAFE_ARG.fullmatch(arg) else shlex.quote(arg) for arg in args)
         if self._cwd:
             command = f"cd {shlex.quote(self._cwd)} && {command}"
         process: _E2BProcess | None = None
@@ -366,47 +673,115 @@ class E2BKaos:
             timeout=None,
             request_timeout=self._request_timeout,
         )
-        process = _E2BProcess(handle, self._sandbox.commands)
-        for chunk in stdout_buffer:
-            process.feed_stdout(chunk)
-        for chunk in stderr_buffer:
-            process.feed_stderr(chunk)
+        process = _E2BProcess(handle, self._sandbox.commands, self._output_chunk_size)
+        # Output that arrived before the handle did is fed in one go.
+        process.feed_stdout("".join(stdout_buffer))
+        process.feed_stderr("".join(stderr_buffer))
         return process
 
-    async def _read_for_append_bytes(self, path: str) -> bytes:
+    async def _open_stream(self, path: str) -> AsyncIterator[bytes]:
+        stream: AsyncIterator[bytes] = await self._sandbox.files.read(
+            path,
+            format="stream",
+            user=self._user,
+            request_timeout=self._request_timeout,
+        )
+        return stream
+
+    @staticmethod
+    async def _close_stream(stream: AsyncIterator[bytes]) -> None:
+        # Newer SDKs return a reader holding the HTTP connection until closed.
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    async def _readinto(self, path: str, view: memoryview) -> int:
+        size = 0
+        if not view.nbytes:
+            return size
+        stream = await self._open_stream(path)
         try:
-            existing: bytes | bytearray = await self._sandbox.files.read(
-                path,
-                format="bytes",
+            async for chunk in stream:
+                take = min(len(chunk), len(view) - size)
+                view[size : size + take] = chunk[:take]
+                size += take
+                if size == len(view):
+                    break
+        finally:
+            await self._close_stream(stream)
+        return size
+
+    async def _append_bytes(self, path: str, payload: bytes) -> None:
+        # Upload only the new bytes and let the sandbox append them, instead of
+        # downloading the whole file and writing it back.
+        if not payload:
+            return
+        staging = f"/tmp/.kaos-append-{uuid.uuid4().hex}"
+        await self._sandbox.files.write(  # type: ignore[reportUnknownMemberType]
+            staging,
+            payload,
+            user=self._user,
+            request_timeout=self._request_timeout,
+        )
+        quoted_path = shlex.quote(path)
+        quoted_staging = shlex.quote(staging)
+        command = (
+            f"mkdir -p -- {shlex.quote(posixpath.dirname(path) or '/')}"
+            f" && cat -- {quoted_staging} >> {quoted_path}"
+            f"; status=$?; rm -f -- {quoted_staging}; exit $status"
+        )
+        try:
+            await self._sandbox.commands.run(
+                command,
                 user=self._user,
+                timeout=None,
                 request_timeout=self._request_timeout,
             )
-        except NotFoundException:
-            return b""
-        return bytes(existing)
+        except CommandExitException as exc:
+            message = exc.stderr.strip() or f"append exited with code {exc.exit_code}"
+            raise OSError(f"Failed to append to {path}: {message}") from exc
 
     async def _get_info(self, path: str) -> EntryInfo | None:
+        # Metadata is reused for a short while so that mkdir -p walks and
+        # stat-before-read sequences do not repeat identical round trips.
+        now = time.monotonic()
+        cached = self._stat_cache.get(path)
+        if cached is not None and cached[0] > now:
+            return cached[1]
         try:
-            info: EntryInfo = await self._sandbox.files.get_info(
+            info: EntryInfo | None = await self._sandbox.files.get_info(
                 path,
                 user=self._user,
                 request_timeout=self._request_timeout,
             )
-            return info
         except NotFoundException:
-            return None
+            info = None
+        if len(self._stat_cache) >= _STAT_CACHE_SIZE:
+            self._stat_cache = {
+                key: value for key, value in self._stat_cache.items() if value[0] > now
+            }
+        self._stat_cache[path] = (now + _STAT_TTL, info)
+        return info
+
+    def _invalidate(self, path: str) -> None:
+        # Writes and make_dir may create missing parents, so drop every ancestor too.
+        while True:
+            self._stat_cache.pop(path, None)
+            parent = posixpath.dirname(path)
+            if parent == path:
+                return
+            path = parent
 
     def _abs_path(self, path: StrOrKaosPath) -> str:
         raw = str(path)
-        if posixpath.isabs(raw):
-            return posixpath.normpath(raw)
-        return posixpath.normpath(posixpath.join(self._cwd, raw))
-
-    @staticmethod
-    def _fnmatch(name: str, pattern: str) -> bool:
-        from fnmatch import fnmatchcase
-
-        return fnmatchcase(name, pattern)
+        if _is_normalized_abs(raw):
+            return raw
+        if raw[:1] != "/":
+            # cwd is normalized, so plain concatenation is enough for simple relative paths.
+            joined = f"{self._cwd}/{raw}"
+            if _is_normalized_abs(joined):
+                return joined
+        return _norm_join(self._cwd, raw)
 
     @staticmethod
     def _to_timestamp(value: datetime) -> float:
@@ -415,8 +790,23 @@ class E2BKaos:
     @staticmethod
     def _with_type_bits(info: EntryInfo) -> int:
         mode = info.mode
-        type_mode = stat.S_IFDIR if info.type == FileType.DIR else stat.S_IFREG
-        if stat.S_IFMT(mode) == 0:
-            mode |= type_mode
-        return mode if mode else type_mode
+        if stat.S_IFMT(mode):
+            return mode
+        return mode | _TYPE_BITS.get(info.type, stat.S_IFREG)
+
+
+# File type bits for entries whose mode lacks them; anything unlisted is a regular file.
+_TYPE_BITS = {FileType.DIR: stat.S_IFDIR}
+
+# Longest a piece of command output waits to be batched with later output.
+_OUTPUT_FLUSH_DELAY = 0.002
+
+# Seconds a get_info result (including "not found") is reused, and how many are kept.
+_STAT_TTL = 1.0
+_STAT_CACHE_SIZE = 1024
+
+# Characters that make a glob pattern more than a literal file name.
+_GLOB_MAGIC = re.compile(r"[*?[]")
 
+# Arguments made only of these characters need no shell quoting (same set as shlex.quote).
+_SAFE_ARG = re.compile(r"[A-Za-z0-9_@%+=:,./-]+")
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import os
+import shlex
 from pathlib import Path
 
 from e2b import AsyncSandbox
@@ -20,9 +21,13 @@ async def main() -> None:
 
     # Step 2: pick a working directory inside the sandbox.
     work_dir_path: str = os.getenv("KIMI_WORK_DIR", DEFAULT_WORK_DIR)
-    # Step 3: create a sandbox (or connect to one).
-    sandbox: AsyncSandbox = await _get_sandbox()
-    print(f"Created sandbox: {sandbox.sandbox_id}")
+    # Step 3: take a sandbox from the pool (created on first use).
+    pool = SandboxPool(
+        max_size=int(os.getenv("KIMI_SANDBOX_POOL_SIZE", DEFAULT_POOL_SIZE)),
+        work_dir=work_dir_path,
+    )
+    sandbox: AsyncSandbox = await pool.acquire()
+    print(f"Using sandbox: {sandbox.sandbox_id}")
 
     # Step 4: install E2B as the KAOS backend for the SDK.
     e2b_kaos: E2BKaos = E2BKaos(
@@ -32,8 +37,8 @@ async def main() -> None:
     token = set_current_kaos(e2b_kaos)
     try:
         # Step 5: use KaosPath to access the sandbox filesystem.
+        # The pool only hands out sandboxes whose work dir already exists.
         work_dir: KaosPath = KaosPath(work_dir_path)
-        await work_dir.mkdir(parents=True, exist_ok=True)
 
         # Step 6: call the high-level prompt API as usual.
         async for msg in prompt(
@@ -47,24 +52,92 @@ async def main() -> None:
         print("─" * 60)
     finally:
         reset_current_kaos(token)
+        # Step 7: hand the sandbox back. This one-shot demo leaves it running until its
+        # timeout so the agent's output can still be inspected; a long-running service
+        # would keep the pool open and call `pool.close()` on shutdown.
+        await pool.release(sandbox)
+
+
+class SandboxPool:
+    """
+    Keeps warm sandboxes so that each prompt does not pay for creating one.
+
+    A service handling many prompts shares one pool: `acquire()` hands out an idle sandbox
+    (creating one while fewer than `max_size` exist) and `release()` returns it for the next
+    prompt. Every sandbox handed out already has its work dir, so callers need no mkdir
+    round trip of their own.
+
+    With `reset_work_dir=True`, `release()` also wipes the work dir so the next prompt starts
+    clean. Only sandboxes the pool created itself are ever wiped or killed; ones connected
+    to by id belong to the user and are left as they are.
+    """
+
+    def __init__(self, *, max_size: int, work_dir: str, reset_work_dir: bool = False) -> None:
+        self._max_size = max_size
+        self._work_dir = work_dir
+        self._reset_work_dir = reset_work_dir
+        self._size = 0
+        self._idle: asyncio.Queue[AsyncSandbox] = asyncio.Queue()
+        self._owned: set[str] = set()  # Ids of the sandboxes this pool created
+
+    async def acquire(self) -> AsyncSandbox:
+        if self._idle.empty() and self._size < self._max_size:
+            self._size += 1
+            try:
+                sandbox, created = await _get_sandbox()
+            except BaseException:
+                self._size -= 1
+                raise
+            if created:
+                self._owned.add(sandbox.sandbox_id)
+            try:
+                await sandbox.files.make_dir(self._work_dir)
+            except BaseException:
+                await self._discard(sandbox)
+                raise
+            return sandbox
+        return await self._idle.get()
+
+    async def release(self, sandbox: AsyncSandbox) -> None:
+        if self._reset_work_dir and sandbox.sandbox_id in self._owned:
+            work_dir = shlex.quote(self._work_dir)
+            try:
+                await sandbox.commands.run(f"rm -rf {work_dir} && mkdir -p {work_dir}")
+            except Exception:
+                # A sandbox that cannot be reset is not handed out again.
+                await self._discard(sandbox)
+                return
+        self._idle.put_nowait(sandbox)
+
+    async def close(self) -> None:
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
+
+    async def _discard(self, sandbox: AsyncSandbox) -> None:
+        self._size -= 1
+        if sandbox.sandbox_id in self._owned:
+            self._owned.discard(sandbox.sandbox_id)
+            await sandbox.kill()
 
 
-async def _get_sandbox() -> AsyncSandbox:
+async def _get_sandbox() -> tuple[AsyncSandbox, bool]:
+    """Return a sandbox and whether it was created here (and may be wiped or killed)."""
     # Tutorial tip: swap this with a connect flow if you already have a sandbox.
     #
     # sandbox_id = os.getenv("E2B_SANDBOX_ID")
     # if sandbox_id:
-    #     return await AsyncSandbox.connect(sandbox_id)
+    #     return await AsyncSandbox.connect(sandbox_id), False
     sandbox: AsyncSandbox = await AsyncSandbox.create(
         template=DEFAULT_TEMPLATE,
         timeout=DEFAULT_TIMEOUT_SEC,
     )
-    return sandbox
+    return sandbox, True
 
 
 DEFAULT_WORK_DIR = "/home/user/kimi-workdir"
 DEFAULT_TEMPLATE = "base"
 DEFAULT_TIMEOUT_SEC = 300
+DEFAULT_POOL_SIZE = 4
 AGENT_FILE = Path(__file__).resolve().with_name("agent.yaml")
 
 
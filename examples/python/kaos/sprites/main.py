@@ -53,6 +53,7 @@ async def main() -> None:
         print("─" * 60)
     finally:
         reset_current_kaos(token)
+        sprites_kaos.close()
         if created and os.getenv("SPRITE_DELETE_ON_EXIT") == "1":
             await asyncio.to_thread(client.delete_sprite, sprite.name)
             print(f"Deleted sprite: {sprite.name}")
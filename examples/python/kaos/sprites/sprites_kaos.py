@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import codecs
+import io
+import os
 import posixpath
-import queue
+import re
 import stat
 import threading
-from collections.abc import AsyncGenerator, Iterable
+from collections.abc import AsyncGenerator, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import translate
+from functools import lru_cache, partial
 from pathlib import PurePosixPath
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Any, Literal, TypeVar
 
+import orjson
 from kaos import AsyncReadable, AsyncWritable, Kaos, KaosProcess, StatResult, StrOrKaosPath
 from kaos.path import KaosPath
 from sprites import Sprite
@@ -32,61 +38,162 @@ if TYPE_CHECKING:
         _: Kaos = sprites_kaos
 
 
+# Keyed on the cwd as well as the path, so chdir needs no invalidation.
+@lru_cache(maxsize=2048)
+def _norm_join(cwd: str, raw: str) -> str:
+    if posixpath.isabs(raw):
+        return posixpath.normpath(raw)
+    return posixpath.normpath(posixpath.join(cwd, raw))
+
+
+def _is_normalized_abs(raw: str) -> bool:
+    """Cheap check for an absolute path that normpath would return unchanged."""
+    return raw[:1] == "/" and "//" not in raw and "/." not in raw and (raw[-1] != "/" or raw == "/")
+
+
+@lru_cache(maxsize=256)
+def _glob_matcher(pattern: str) -> Callable[[str], object]:
+    """Case-sensitive matcher for a glob pattern, built once per pattern."""
+    suffix = pattern[1:]
+    if pattern[:1] == "*" and not _GLOB_MAGIC.search(suffix):
+        # "*.py" and friends only need a suffix test, no regex at all.
+        return lambda name: name.endswith(suffix)
+    return re.compile(translate(pattern)).match
+
+
+T = TypeVar("T")
+
+
+def _run_in(
+    executor: ThreadPoolExecutor, fn: Callable[..., T], /, *args: Any, **kwargs: Any
+) -> asyncio.Future[T]:
+    """
+    Run a blocking Sprites SDK call on `executor` instead of the default thread pool.
+
+    Returns the executor future itself rather than wrapping it in a coroutine, so each call
+    costs no extra frame; a partial is only built when there are keyword arguments.
+    """
+    if kwargs:
+        fn = partial(fn, *args, **kwargs)
+        args = ()
+    return asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
 class _SpritesCommandInput:
+    """
+    Stdin source for a Sprites command: written from the event loop, read by the runner thread.
+
+    Bytes are copied straight into a ring buffer (grown when a write does not fit), so a
+    write costs one short lock hold and no per-chunk objects, and the reader is woken
+    through a single event that is only signalled when it is not already set.
+    """
+
     def __init__(self) -> None:
-        self._queue: queue.Queue[bytes | None] = queue.Queue()
-        self._buffer = bytearray()
+        self._ring = bytearray(_STDIN_RING_SIZE)
+        self._head = 0  # Index of the first unread byte
+        self._size = 0  # Number of unread bytes
         self._closed = False
         self._eof_sent = False
         self._lock = threading.Lock()
+        self._data_ready = threading.Event()
 
     def write(self, data: bytes) -> None:
-        if not data:
+        # `_closed` only goes False -> True, so writes after close are dropped without
+        # touching the lock; the check under the lock settles a concurrent close.
+        if not data or self._closed:
             return
         with self._lock:
             if self._closed:
                 return
-        self._queue.put(bytes(data))
+            self._put(memoryview(data).cast("B"))
+            self._wake_reader()
 
     def writelines(self, data: Iterable[bytes], /) -> None:
-        for chunk in data:
-            self.write(chunk)
+        chunks = [memoryview(chunk).cast("B") for chunk in data if chunk]
+        if not chunks:
+            return
+        total = sum(len(chunk) for chunk in chunks)
+        with self._lock:
+            if self._closed:
+                return
+            # Make room once so the copies below never regrow the ring.
+            if self._size + total > len(self._ring):
+                self._grow(self._size + total)
+            for chunk in chunks:
+                self._put(chunk)
+            self._wake_reader()
 
     def close(self) -> None:
         with self._lock:
+            self._closed = True
             if self._eof_sent:
-                self._closed = True
                 return
-            self._closed = True
             self._eof_sent = True
-        self._queue.put(None)
+            self._data_ready.set()
 
     def write_eof(self) -> None:
         self.close()
 
     def is_closing(self) -> bool:
-        with self._lock:
-            return self._closed
+        # A single attribute read of a flag that only ever goes False -> True.
+        return self._closed
 
     def read(self, n: int = -1) -> bytes:
         if n == 0:
             return b""
 
-        while not self._buffer:
-            item = self._queue.get()
-            if item is None:
-                return b""
-            self._buffer.extend(item)
-
-        if n < 0:
-            payload = bytes(self._buffer)
-            self._buffer.clear()
-            return payload
-
-        payload = bytes(self._buffer[:n])
-        del self._buffer[:n]
+        while True:
+            with self._lock:
+                if self._size:
+                    payload = self._take(self._size if n < 0 else min(n, self._size))
+                    if not self._size and not self._eof_sent:
+                        self._data_ready.clear()
+                    return payload
+                if self._eof_sent:
+                    return b""
+            self._data_ready.wait()
+
+    def _wake_reader(self) -> None:
+        # Event.set() takes the event's own condition lock; skip it while the reader has
+        # not yet drained the data from an earlier write. Called with `_lock` held, and
+        # the reader only clears the event under `_lock`, so the check cannot race.
+        if not self._data_ready.is_set():
+            self._data_ready.set()
+
+    def _put(self, data: memoryview) -> None:
+        n = len(data)
+        if self._size + n > len(self._ring):
+            self._grow(self._size + n)
+        capacity = len(self._ring)
+        tail = (self._head + self._size) % capacity
+        first = min(n, capacity - tail)
+        self._ring[tail : tail + first] = data[:first]
+        self._ring[: n - first] = data[first:]
+        self._size += n
+
+    def _take(self, n: int) -> bytes:
+        capacity = len(self._ring)
+        first = min(n, capacity - self._head)
+        view = memoryview(self._ring)
+        if first == n:
+            payload = bytes(view[self._head : self._head + n])
+        else:
+            payload = b"".join((view[self._head :], view[: n - first]))
+        self._head = (self._head + n) % capacity
+        self._size -= n
         return payload
 
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._ring)
+        while capacity < needed:
+            capacity *= 2
+        size = self._size
+        ring = bytearray(capacity)
+        ring[:size] = self._take(size)
+        self._ring = ring
+        self._head = 0
+        self._size = size
+
 
 class _SpritesStdin:
     def __init__(self, source: _SpritesCommandInput) -> None:
@@ -118,21 +225,37 @@ class _SpritesStdin:
 
 
 class _StreamWriterProxy:
+    """
+    File-like sink the Sprites runner thread writes command output to.
+
+    Writes are staged and handed to the event loop in batches: a cross-thread wakeup is
+    scheduled only when the staging buffer goes from empty to non-empty.
+    """
+
     def __init__(self, loop: asyncio.AbstractEventLoop, reader: asyncio.StreamReader) -> None:
         self._loop = loop
         self._reader = reader
         self._closed = False
         self._lock = threading.Lock()
+        self._staged = bytearray()
+        self._scheduled = False
 
     def write(self, data: bytes | bytearray) -> int:
-        payload = bytes(data)
-        if not payload:
+        # Appending to the staging buffer is the only copy made of `data`.
+        size = len(data)
+        # Unlocked fast path once closed; the re-check under the lock still guarantees
+        # nothing is staged after `_close_reader` has fed EOF.
+        if not size or self._closed:
             return 0
         with self._lock:
             if self._closed:
                 return 0
-        self._loop.call_soon_threadsafe(self._reader.feed_data, payload)
-        return len(payload)
+            self._staged += data
+            if self._scheduled:
+                return size
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._flush)
+        return size
 
     def flush(self) -> None:
         return None
@@ -142,12 +265,34 @@ class _StreamWriterProxy:
             if self._closed:
                 return
             self._closed = True
-        self._loop.call_soon_threadsafe(self._reader.feed_eof)
+        self._loop.call_soon_threadsafe(self._close_reader)
+
+    def _flush(self) -> None:
+        # Hand the staged buffer itself to the reader and start a fresh one; nothing
+        # touches the old buffer afterwards, so it needs no bytes() copy.
+        with self._lock:
+            payload, self._staged = self._staged, bytearray()
+            self._scheduled = False
+        if payload:
+            self._reader.feed_data(payload)
+
+    def _close_reader(self) -> None:
+        self._flush()
+        self._reader.feed_eof()
 
 
 class _SpritesProcess:
-    def __init__(self, sprite: Sprite, args: tuple[str, ...], cwd: str) -> None:
+    def __init__(
+        self,
+        sprite: Sprite,
+        args: tuple[str, ...],
+        cwd: str,
+        call: Callable[..., Any],
+        run_call: Callable[..., Any],
+    ) -> None:
         self._sprite = sprite
+        self._call = call
+        self._run_call = run_call
         self._args = args
         self._cwd = cwd
         self._stdin_source = _SpritesCommandInput()
@@ -180,33 +325,30 @@ class _SpritesProcess:
         if self._returncode is not None:
             return
         self._stdin_source.write_eof()
-        await asyncio.to_thread(self._session_id_ready.wait, 1.0)
+        await self._call(self._session_id_ready.wait, 1.0)
         if self._session_id is None:
             return
-        await asyncio.to_thread(kill_session, self._sprite, self._session_id)
+        await self._call(kill_session, self._sprite, self._session_id)
 
     def _on_text_message(self, message: bytes) -> None:
-        try:
-            payload: object = json.loads(message.decode("utf-8", errors="replace"))
-        except json.JSONDecodeError:
+        # Only session_info matters, and it names the session once; later text frames are
+        # not parsed at all.
+        if self._session_id is not None:
             return
-        if not isinstance(payload, dict):
+        try:
+            payload: object = orjson.loads(message)
+        except orjson.JSONDecodeError:
             return
-        if payload.get("type") != "session_info":
+        if not isinstance(payload, dict) or payload.get("type") != "session_info":
             return
 
-        session_id_obj: object | None = payload.get("id")
-        if isinstance(session_id_obj, str):
-            self._session_id = session_id_obj
+        session_id: object | None = payload.get("id")
+        if not isinstance(session_id, str):
+            data_obj: object | None = payload.get("data")
+            session_id = data_obj.get("id") if isinstance(data_obj, dict) else None
+        if isinstance(session_id, str):
+            self._session_id = session_id
             self._session_id_ready.set()
-            return
-
-        data_obj: object | None = payload.get("data")
-        if isinstance(data_obj, dict):
-            nested_session_id: object | None = data_obj.get("id")
-            if isinstance(nested_session_id, str):
-                self._session_id = nested_session_id
-                self._session_id_ready.set()
 
     def _run_sync(self) -> int:
         command = self._sprite.command(*self._args, cwd=self._cwd)
@@ -229,7 +371,7 @@ class _SpritesProcess:
         return exit_code if exit_code >= 0 else 1
 
     async def _run(self) -> None:
-        exit_code = await asyncio.to_thread(self._run_sync)
+        exit_code = await self._run_call(self._run_sync)
         self._returncode = exit_code
         self._stdout_proxy.close()
         self._stderr_proxy.close()
@@ -252,11 +394,32 @@ class SpritesKaos:
         *,
         home_dir: str = "/home/sprite",
         cwd: str | None = None,
+        max_workers: int = 32,
+        max_processes: int | None = None,
     ) -> None:
         self._sprite = sprite
         self._home_dir = posixpath.normpath(home_dir)
         self._cwd = posixpath.normpath(cwd) if cwd is not None else self._home_dir
         self._filesystem: SpriteFilesystem = sprite.filesystem("/")
+        # SpritePath objects are immutable, so one per absolute path can be reused.
+        self._fs_paths: dict[str, SpritePath] = {}
+        # Sprites SDK calls block, so they run on pools of our own rather than the default
+        # executor. A running command holds its thread until it exits, so commands get a
+        # separate bounded pool and can never starve the short filesystem calls.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sprites-fs"
+        )
+        self._process_executor = ThreadPoolExecutor(
+            max_workers=max_processes or _DEFAULT_MAX_PROCESSES,
+            thread_name_prefix="sprites-proc",
+        )
+        self._call = partial(_run_in, self._executor)
+        self._run_call = partial(_run_in, self._process_executor)
+
+    def close(self) -> None:
+        """Release the worker threads; running commands keep theirs until they exit."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._process_executor.shutdown(wait=False, cancel_futures=True)
 
     def pathclass(self) -> type[PurePosixPath]:
         return PurePosixPath
@@ -274,7 +437,7 @@ class SpritesKaos:
         abs_path = self._abs_path(path)
         target = self._fs_path(abs_path)
         try:
-            info = await asyncio.to_thread(target.stat)
+            info = await self._call(target.stat)
         except FilesystemError as exc:
             self._raise_filesystem_error(exc, abs_path)
         if not info.is_dir:
@@ -287,7 +450,7 @@ class SpritesKaos:
         abs_path = self._abs_path(path)
         target = self._fs_path(abs_path)
         try:
-            info = await asyncio.to_thread(target.stat)
+            info = await self._call(target.stat)
         except FilesystemError as exc:
             self._raise_filesystem_error(exc, abs_path)
 
@@ -310,7 +473,7 @@ class SpritesKaos:
         abs_path = self._abs_path(path)
         target = self._fs_path(abs_path)
         try:
-            entries = await asyncio.to_thread(lambda: [str(entry) for entry in target.iterdir()])
+            entries = await self._call(lambda: [str(entry) for entry in target.iterdir()])
         except FilesystemError as exc:
             self._raise_filesystem_error(exc, abs_path)
         for entry in entries:
@@ -321,23 +484,23 @@ class SpritesKaos:
     ) -> AsyncGenerator[KaosPath]:
         if not case_sensitive:
             raise ValueError("Case insensitive glob is not supported in current environment")
-        from fnmatch import fnmatchcase
-
         abs_path = self._abs_path(path)
         target = self._fs_path(abs_path)
         try:
-            entries = await asyncio.to_thread(lambda: [str(entry) for entry in target.iterdir()])
+            entries = await self._call(lambda: [str(entry) for entry in target.iterdir()])
         except FilesystemError as exc:
             self._raise_filesystem_error(exc, abs_path)
+        match = _glob_matcher(pattern)
+        basename = posixpath.basename  # Bound once for the loop below.
         for entry in entries:
-            if fnmatchcase(posixpath.basename(entry), pattern):
+            if match(basename(entry)):
                 yield KaosPath(entry)
 
     async def readbytes(self, path: StrOrKaosPath, n: int | None = None) -> bytes:
         abs_path = self._abs_path(path)
         target = self._fs_path(abs_path)
         try:
-            payload = await asyncio.to_thread(target.read_bytes)
+            payload = await self._call(target.read_bytes)
         except FilesystemError as exc:
             self._raise_filesystem_error(exc, abs_path)
         return payload if n is None else payload[:n]
@@ -359,15 +522,28 @@ class SpritesKaos:
         encoding: str = "utf-8",
         errors: Literal["strict", "ignore", "replace"] = "strict",
     ) -> AsyncGenerator[str]:
-        text = await self.readtext(path, encoding=encoding, errors=errors)
-        for line in text.splitlines(keepends=True):
-            yield line
+        # The filesystem API only returns whole files, but decoding and splitting slice by
+        # slice means the full text and a list of all its lines are never built.
+        payload = memoryview(await self.readbytes(path))
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+        carry = ""
+        for offset in range(0, len(payload), _READ_CHUNK_SIZE):
+            text = decoder.decode(payload[offset : offset + _READ_CHUNK_SIZE])
+            start = 0
+            while (end := text.find("\n", start)) != -1:
+                yield carry + text[start : end + 1]
+                carry = ""
+                start = end + 1
+            carry += text[start:]
+        carry += decoder.decode(b"", final=True)
+        if carry:
+            yield carry
 
     async def writebytes(self, path: StrOrKaosPath, data: bytes) -> int:
         abs_path = self._abs_path(path)
         target = self._fs_path(abs_path)
         try:
-            await asyncio.to_thread(target.write_bytes, data)
+            await self._call(target.write_bytes, data)
         except FilesystemError as exc:
             self._raise_filesystem_error(exc, abs_path)
         return len(data)
@@ -385,16 +561,11 @@ class SpritesKaos:
         target = self._fs_path(abs_path)
         payload = data.encode(encoding, errors=errors)
 
+        if mode == "a":
+            await self._call(self._append_bytes, abs_path, payload)
+            return len(data)
         try:
-            if mode == "a":
-                existing = b""
-                try:
-                    existing = await asyncio.to_thread(target.read_bytes)
-                except FileNotFoundError_:
-                    existing = b""
-                await asyncio.to_thread(target.write_bytes, existing + payload)
-            else:
-                await asyncio.to_thread(target.write_bytes, payload)
+            await self._call(target.write_bytes, payload)
         except FilesystemError as exc:
             self._raise_filesystem_error(exc, abs_path)
         return len(data)
@@ -404,48 +575,84 @@ class SpritesKaos:
     ) -> None:
         abs_path = self._abs_path(path)
         target = self._fs_path(abs_path)
+        parent_path = posixpath.dirname(abs_path) or "/"
+        parent = self._fs_path(parent_path)
 
-        try:
-            info = await asyncio.to_thread(target.stat)
-            if not info.is_dir:
-                raise FileExistsError(f"{abs_path} already exists and is not a directory")
-            if not exist_ok:
-                raise FileExistsError(f"{abs_path} already exists")
-            return
-        except FileNotFoundError_:
-            pass
-        except FilesystemError as exc:
-            self._raise_filesystem_error(exc, abs_path)
+        # The existence check, parent check and mkdir all run in one worker hop.
+        def make_dir() -> None:
+            try:
+                info = target.stat()
+            except FileNotFoundError_:
+                pass
+            except FilesystemError as exc:
+                self._raise_filesystem_error(exc, abs_path)
+            else:
+                if not info.is_dir:
+                    raise FileExistsError(f"{abs_path} already exists and is not a directory")
+                if not exist_ok:
+                    raise FileExistsError(f"{abs_path} already exists")
+                return
+
+            if not parents:
+                try:
+                    parent_info = parent.stat()
+                except FilesystemError as exc:
+                    self._raise_filesystem_error(exc, parent_path)
+                if not parent_info.is_dir:
+                    raise NotADirectoryError(f"{parent_path} is not a directory")
 
-        if not parents:
-            parent_path = posixpath.dirname(abs_path) or "/"
-            parent = self._fs_path(parent_path)
             try:
-                parent_info = await asyncio.to_thread(parent.stat)
+                target.mkdir(parents=parents, exist_ok=exist_ok)
             except FilesystemError as exc:
-                self._raise_filesystem_error(exc, parent_path)
-            if not parent_info.is_dir:
-                raise NotADirectoryError(f"{parent_path} is not a directory")
+                self._raise_filesystem_error(exc, abs_path)
 
-        try:
-            await asyncio.to_thread(target.mkdir, parents=parents, exist_ok=exist_ok)
-        except FilesystemError as exc:
-            self._raise_filesystem_error(exc, abs_path)
+        await self._call(make_dir)
 
     async def exec(self, *args: str) -> KaosProcess:
         if not args:
             raise ValueError("At least one argument (the program to execute) is required.")
-        process = _SpritesProcess(self._sprite, args, self._cwd)
+        process = _SpritesProcess(self._sprite, args, self._cwd, self._call, self._run_call)
         return process
 
+    def _append_bytes(self, path: str, payload: bytes) -> None:
+        # The filesystem API has no append, so stream only the new bytes into `cat >>` on
+        # the sprite instead of downloading the whole file and writing it back.
+        if not payload:
+            return
+        stderr = io.BytesIO()
+        command = self._sprite.command(
+            "sh",
+            "-c",
+            'mkdir -p -- "$(dirname -- "$1")" && cat >> "$1"',
+            "sh",
+            path,
+            stdin=io.BytesIO(payload),
+            stderr=stderr,
+        )
+        try:
+            command.run()
+        except ExecError as exc:
+            message = stderr.getvalue().decode("utf-8", "replace").strip()
+            raise OSError(f"Failed to append to {path}: {message or exc}") from exc
+
     def _abs_path(self, path: StrOrKaosPath) -> str:
-        raw = str(path)
-        if posixpath.isabs(raw):
-            return posixpath.normpath(raw)
-        return posixpath.normpath(posixpath.join(self._cwd, raw))
+        raw = path if isinstance(path, str) else str(path)
+        if _is_normalized_abs(raw):
+            return raw
+        if raw[:1] != "/":
+            # cwd is normalized, so plain concatenation is enough for simple relative paths.
+            joined = f"{self._cwd}/{raw}"
+            if _is_normalized_abs(joined):
+                return joined
+        return _norm_join(self._cwd, raw)
 
     def _fs_path(self, abs_path: str) -> SpritePath:
-        return self._filesystem / abs_path
+        target = self._fs_paths.get(abs_path)
+        if target is None:
+            if len(self._fs_paths) >= _FS_PATH_CACHE_SIZE:
+                self._fs_paths.clear()
+            target = self._fs_paths[abs_path] = self._filesystem / abs_path
+        return target
 
     @staticmethod
     def _raise_filesystem_error(exc: FilesystemError, path: str) -> None:
@@ -468,3 +675,19 @@ class SpritesKaos:
             return mode_value
         type_mode = stat.S_IFDIR if is_dir else stat.S_IFREG
         return mode_value | type_mode
+
+
+# Commands that may run at once per SpritesKaos; further ones queue for a runner thread.
+_DEFAULT_MAX_PROCESSES = min(32, (os.cpu_count() or 1) * 4)
+
+# Characters that make a glob pattern more than a literal file name.
+_GLOB_MAGIC = re.compile(r"[*?[]")
+
+# Number of SpritePath objects kept by SpritesKaos before the cache is reset.
+_FS_PATH_CACHE_SIZE = 1024
+
+# Slice of a downloaded file decoded at a time by readlines.
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Initial stdin ring buffer size; it doubles whenever a write does not fit.
+_STDIN_RING_SIZE = 64 * 1024
@@ -10,19 +10,36 @@ Provides an asynchronous event bus for agents to:
 from __future__ import annotations
 
 import asyncio
-from collections import defaultdict
+import inspect
+import re
+import time
+from collections import defaultdict, deque
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import TYPE_CHECKING, Any, Callable, TypeVar
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, TypeVar, cast
 
 if TYPE_CHECKING:
     from collections.abc import Awaitable
 
 T = TypeVar("T")
 
+# Upper bound on memoized event types before the dispatch cache is reset
+_MAX_RESOLVED = 4096
+
 # Type alias for event handler functions
 EventHandler = Callable[["Event"], "Awaitable[None] | None"]
 
+# A registered handler paired with whether it must be awaited
+_Registration = tuple[EventHandler, bool]
+
+
+def _is_async_handler(handler: EventHandler) -> bool:
+    """Return True for coroutine functions and objects with an async __call__."""
+    return inspect.iscoroutinefunction(handler) or inspect.iscoroutinefunction(
+        type(handler).__call__
+    )
+
 
 @dataclass(frozen=True)
 class Event:
@@ -30,7 +47,9 @@ class Event:
     
     Attributes:
         type: Event type identifier (e.g., "github.pr.created")
-        data: Event payload data
+        data: Event payload data. The dict is owned by the event and is not
+            copied, so pass a fresh dict or use ``copy_data()`` to keep a
+            private copy.
         source: Event source identifier (e.g., "github-webhook")
         timestamp: When the event occurred
         id: Unique event identifier
@@ -40,11 +59,25 @@ class Event:
     data: dict[str, Any] = field(default_factory=dict)
     source: str = "unknown"
     timestamp: datetime = field(default_factory=datetime.now)
-    id: str = field(default_factory=lambda: asyncio.get_event_loop().time().__str__())
+    id: str = field(default_factory=lambda: str(time.monotonic_ns()))
+    
+    def copy_data(self) -> dict[str, Any]:
+        """Return a shallow copy of the event payload."""
+        return dict(self.data)
+
+
+def _compile_pattern(pattern: str) -> re.Pattern[str]:
+    """Translate a wildcard event pattern into a compiled regex.
     
-    def __post_init__(self) -> None:
-        # Ensure data is immutable for hashing
-        object.__setattr__(self, "data", dict(self.data))
+    "*" on its own matches every event type; otherwise each "*" segment
+    matches exactly one dot-separated segment of the event type.
+    """
+    if pattern == "*":
+        return re.compile(r".*", re.DOTALL)
+    return re.compile(r"\.".join(
+        r"[^.]*" if part == "*" else re.escape(part)
+        for part in pattern.split(".")
+    ))
 
 
 class EventBus:
@@ -85,15 +118,23 @@ class EventBus:
     
     def __init__(self) -> None:
         """Initialize the event bus."""
-        # Map of event type patterns to handler sets
-        self._handlers: dict[str, set[EventHandler]] = defaultdict(set)
+        # Exact event types map straight to their handler sets
+        self._exact: dict[str, set[_Registration]] = defaultdict(set)
+        # Wildcard patterns, compiled once when first registered
+        self._wildcards: dict[str, tuple[re.Pattern[str], set[_Registration]]] = {}
+        # Matched (sync, async) handlers per concrete event type, reset on
+        # (un)registration
+        self._resolved: dict[
+            str, tuple[tuple[EventHandler, ...], tuple[EventHandler, ...]]
+        ] = {}
+        # Tasks started by emit_nowait, kept referenced until they finish
+        self._pending: set[asyncio.Task[None]] = set()
         # Middleware chain
         self._middleware: list[Callable[[Event], Awaitable[Event]]] = []
-        # Event history for replay/debugging
-        self._history: list[Event] = []
+        # Event history for replay/debugging; the deque drops the oldest
+        # entries itself, and emit never yields while touching it
         self._max_history = 1000
-        # Lock for thread-safe operations
-        self._lock = asyncio.Lock()
+        self._history: deque[Event] = deque(maxlen=self._max_history)
     
     def on(self, event_type: str) -> Callable[[EventHandler], EventHandler]:
         """Decorator to register an event handler.
@@ -118,7 +159,16 @@ class EventBus:
             ```
         """
         def decorator(handler: EventHandler) -> EventHandler:
-            self._handlers[event_type].add(handler)
+            registration = (handler, _is_async_handler(handler))
+            if "*" not in event_type:
+                self._exact[event_type].add(registration)
+            else:
+                entry = self._wildcards.get(event_type)
+                if entry is None:
+                    entry = (_compile_pattern(event_type), set())
+                    self._wildcards[event_type] = entry
+                entry[1].add(registration)
+            self._invalidate(event_type)
             return handler
         return decorator
     
@@ -132,25 +182,26 @@ class EventBus:
         Returns:
             True if handler was found and removed
         """
-        if event_type in self._handlers:
-            self._handlers[event_type].discard(handler)
-            return True
-        return False
+        handlers = self._handlers_for(event_type)
+        if handlers is None:
+            return False
+        handlers.discard((handler, _is_async_handler(handler)))
+        self._invalidate(event_type)
+        return True
     
     async def emit(self, event: Event) -> None:
         """Emit an event to all matching handlers.
         
         Handlers matching the event type (including wildcards) are called
-        concurrently. Errors in individual handlers don't affect others.
+        concurrently; plain functions run inline first, then coroutine
+        handlers are awaited together. Errors in individual handlers don't
+        affect others.
         
         Args:
             event: Event to emit
         """
-        async with self._lock:
-            # Store in history
-            self._history.append(event)
-            if len(self._history) > self._max_history:
-                self._history.pop(0)
+        # Store in history
+        self._history.append(event)
         
         # Apply middleware
         processed_event = event
@@ -158,52 +209,121 @@ class EventBus:
             processed_event = await middleware(processed_event)
         
         # Find all matching handlers
-        handlers: set[EventHandler] = set()
-        for pattern, pattern_handlers in self._handlers.items():
-            if self._matches_pattern(event.type, pattern):
-                handlers.update(pattern_handlers)
-        
-        if not handlers:
+        resolved = self._resolved.get(event.type)
+        if resolved is None:
+            resolved = self._resolve(event.type)
+        sync_handlers, async_handlers = resolved
+        
+        # Plain functions need no task or gather bookkeeping
+        returned: list[Awaitable[None]] = []
+        for handler in sync_handlers:
+            try:
+                result = handler(processed_event)
+            except Exception as e:
+                print(f"Event handler error for {processed_event.type}: {e}")
+            else:
+                if inspect.isawaitable(result):
+                    # A plain callable (lambda, partial) returning a coroutine
+                    returned.append(result)
+        
+        if not async_handlers and not returned:
             return
         
-        # Call all handlers concurrently
+        # Call all coroutine handlers concurrently
         await asyncio.gather(
-            *[self._call_handler(h, processed_event) for h in handlers],
+            *[self._call_handler(h, processed_event) for h in async_handlers],
+            *[self._await_result(r, processed_event) for r in returned],
             return_exceptions=True  # Don't let one handler failure stop others
         )
     
-    async def _call_handler(self, handler: EventHandler, event: Event) -> None:
-        """Call a single handler with error handling."""
+    def emit_nowait(self, event: Event) -> None:
+        """Emit an event without waiting for its handlers to finish.
+        
+        Plain-function handlers are scheduled as loop callbacks and coroutine
+        handlers as tasks on the running loop; this method returns
+        immediately. Must be called from
+        within a running event loop.
+        
+        Args:
+            event: Event to emit
+        """
+        loop = asyncio.get_running_loop()
+        if self._middleware:
+            # Middleware is async, so the whole emit has to run as a task
+            self._track(loop.create_task(self.emit(event)))
+            return
+        
+        self._history.append(event)
+        
+        resolved = self._resolved.get(event.type)
+        if resolved is None:
+            resolved = self._resolve(event.type)
+        sync_handlers, async_handlers = resolved
+        for handler in sync_handlers:
+            loop.call_soon(self._call_sync, handler, event)
+        for handler in async_handlers:
+            self._track(loop.create_task(self._call_handler(handler, event)))
+    
+    def _track(self, task: asyncio.Task[None]) -> None:
+        """Hold a reference to a fire-and-forget task until it completes."""
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    def _call_sync(self, handler: EventHandler, event: Event) -> None:
+        """Call a single plain-function handler with error handling."""
         try:
             result = handler(event)
-            if asyncio.iscoroutine(result):
-                await result
+        except Exception as e:
+            print(f"Event handler error for {event.type}: {e}")
+            return
+        if inspect.isawaitable(result):
+            # A plain callable (lambda, partial) returning a coroutine
+            self._track(asyncio.ensure_future(self._await_result(result, event)))
+    
+    async def _call_handler(self, handler: EventHandler, event: Event) -> None:
+        """Call a single coroutine handler with error handling."""
+        try:
+            await cast("Awaitable[None]", handler(event))
         except Exception as e:
             # Log error but don't stop other handlers
             print(f"Event handler error for {event.type}: {e}")
     
-    def _matches_pattern(self, event_type: str, pattern: str) -> bool:
-        """Check if event type matches a pattern.
-        
-        Supports:
-        - Exact match: "github.pr.created" matches "github.pr.created"
-        - Single wildcard: "github.pr.*" matches "github.pr.created"
-        - Multi-level wildcard: "github.*" matches "github.pr.created"
-        """
-        if pattern == "*":
-            return True
-        
-        event_parts = event_type.split(".")
-        pattern_parts = pattern.split(".")
-        
-        if len(event_parts) != len(pattern_parts):
-            return False
-        
-        for event_part, pattern_part in zip(event_parts, pattern_parts):
-            if pattern_part != "*" and pattern_part != event_part:
-                return False
-        
-        return True
+    async def _await_result(self, result: Awaitable[None], event: Event) -> None:
+        """Await what a plain-function handler returned, with error handling."""
+        try:
+            await result
+        except Exception as e:
+            print(f"Event handler error for {event.type}: {e}")
+    
+    def _resolve(
+        self, event_type: str
+    ) -> tuple[tuple[EventHandler, ...], tuple[EventHandler, ...]]:
+        """Collect and memoize the handlers matching a concrete event type."""
+        if len(self._resolved) >= _MAX_RESOLVED:
+            self._resolved.clear()
+        matched: set[_Registration] = set(self._exact.get(event_type, ()))
+        for pattern_re, registrations in self._wildcards.values():
+            if pattern_re.fullmatch(event_type):
+                matched.update(registrations)
+        sync_handlers = tuple(h for h, is_async in matched if not is_async)
+        async_handlers = tuple(h for h, is_async in matched if is_async)
+        resolved = self._resolved[event_type] = (sync_handlers, async_handlers)
+        return resolved
+    
+    def _invalidate(self, event_type: str) -> None:
+        """Drop memoized handlers affected by a change to ``event_type``."""
+        if "*" in event_type:
+            self._resolved.clear()
+        else:
+            self._resolved.pop(event_type, None)
+    
+    def _handlers_for(self, event_type: str) -> set[_Registration] | None:
+        """Return the handler set registered under an exact type or pattern."""
+        handlers = self._exact.get(event_type)
+        if handlers is not None:
+            return handlers
+        entry = self._wildcards.get(event_type)
+        return entry[1] if entry is not None else None
     
     def use(self, middleware: Callable[[Event], Awaitable[Event]]) -> None:
         """Add middleware to process all events.
@@ -241,12 +361,12 @@ class EventBus:
         Returns:
             List of historical events
         """
-        events = self._history
-        
         if event_type:
-            events = [e for e in events if e.type == event_type]
+            events = [e for e in self._history if e.type == event_type]
+            return events[-limit:]
         
-        return events[-limit:]
+        start = max(0, len(self._history) - limit)
+        return list(islice(self._history, start, None))
     
     def clear_history(self) -> None:
         """Clear event history."""
@@ -262,9 +382,12 @@ class EventBus:
             Number of handlers
         """
         if event_type:
-            return len(self._handlers.get(event_type, set()))
+            return len(self._handlers_for(event_type) or ())
         
-        return sum(len(handlers) for handlers in self._handlers.values())
+        return (
+            sum(len(handlers) for handlers in self._exact.values())
+            + sum(len(handlers) for _, handlers in self._wildcards.values())
+        )
 
 
 class EventSource:
@@ -331,6 +454,14 @@ class TimerSource(EventSource):
     def __init__(self, bus: EventBus) -> None:
         super().__init__(bus)
         self._schedules: dict[str, asyncio.Task] = {}
+        # Set by stop() so sleeping schedules wake immediately instead of
+        # finishing their current interval
+        self._stop_event = asyncio.Event()
+    
+    async def start(self) -> None:
+        """Start the timer source."""
+        self._stop_event.clear()
+        await super().start()
     
     def schedule(
         self,
@@ -340,20 +471,34 @@ class TimerSource(EventSource):
     ) -> None:
         """Schedule a recurring event.
         
+        Ticks follow fixed monotonic deadlines, so time spent emitting does
+        not accumulate as drift.
+        
         Args:
             event_type: Type of event to emit
             interval: Interval in seconds
             data: Optional data to include in events
         """
         async def emit_periodically() -> None:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time()
             while self._running:
-                await asyncio.sleep(interval)
-                if self._running:
-                    await self.bus.emit(Event(
-                        type=event_type,
-                        data=data or {},
-                        source="timer"
-                    ))
+                deadline += interval
+                now = loop.time()
+                if deadline < now:
+                    # Fell behind (e.g. a slow handler); skip the missed ticks
+                    # rather than firing them back to back
+                    deadline = now
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=deadline - now)
+                    break
+                except TimeoutError:
+                    pass
+                await self.bus.emit(Event(
+                    type=event_type,
+                    data=dict(data) if data else {},
+                    source="timer"
+                ))
         
         task = asyncio.create_task(emit_periodically())
         self._schedules[event_type] = task
@@ -374,11 +519,13 @@ class TimerSource(EventSource):
         return False
     
     async def stop(self) -> None:
-        """Stop all scheduled events."""
-        await super().stop()
+        """Stop all scheduled events.
         
-        for task in self._schedules.values():
-            task.cancel()
+        Sleeping schedules wake immediately; an emit already in progress is
+        allowed to finish.
+        """
+        await super().stop()
+        self._stop_event.set()
         
         # Wait for tasks to complete
         if self._schedules:
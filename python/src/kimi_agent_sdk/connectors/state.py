@@ -7,22 +7,265 @@ enabling long-running workflows and stateful conversations.
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import json
+import math
+import os
+import re
+import weakref
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, asdict
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, TypeVar
+from typing import TYPE_CHECKING, Any, BinaryIO, Literal, TypeVar
 
 if TYPE_CHECKING:
-    from collections.abc import AsyncIterator
+    from collections.abc import AsyncIterator, Iterator
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib codec
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; only FileStateBackend(format="msgpack") needs it
+    msgpack = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; without it large values are read whole
+    ijson = None
 
 T = TypeVar("T")
 
 
-@dataclass
+def _dumps(data: Any, pretty: bool = False) -> bytes:
+    """Serialize state to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        try:
+            payload = orjson.dumps(data, option=option)
+        except TypeError:
+            pass  # e.g. integers wider than 64 bits; the stdlib copes with those
+        else:
+            # orjson writes NaN and infinities as null; the stdlib keeps them
+            if b"null" not in payload or not _has_non_finite(data):
+                return payload
+    return json.dumps(data, indent=2 if pretty else None).encode()
+
+
+def _has_non_finite(data: Any) -> bool:
+    """Check whether ``data`` holds a NaN or infinite float anywhere."""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(_has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_has_non_finite(item) for item in data)
+    return False
+
+
+# orjson reads integers outside 64 bits back as floats; those have at least
+# 19 digits, and a looser match only costs a slower parse
+_WIDE_INT = re.compile(rb"\d{19}")
+
+
+def _loads(payload: bytes) -> Any:
+    """Parse JSON bytes, using orjson when it can read them exactly."""
+    if orjson is not None and not _WIDE_INT.search(payload):
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            pass  # e.g. NaN or Infinity, which only the stdlib writes
+    # json.loads accepts bytes too, so neither path decodes to str first
+    return json.loads(payload)
+
+
+def _check_format(format: str) -> None:
+    """Validate a backend's ``format`` argument."""
+    if format == "msgpack":
+        if msgpack is None:
+            raise ImportError('format="msgpack" requires the msgpack package')
+    elif format != "json":
+        raise ValueError(f"Unknown state format: {format!r}")
+
+
+def _encode(data: Any, format: str, pretty: bool = False) -> bytes:
+    """Serialize a state record in the given format."""
+    if format == "msgpack":
+        return msgpack.packb(data, use_bin_type=True)
+    return _dumps(data, pretty)
+
+
+def _decode(payload: bytes, format: str) -> Any:
+    """Deserialize a state record written by ``_encode``."""
+    if format == "msgpack":
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    return _loads(payload)
+
+# State files start with their version, so it can be read without parsing
+# the (possibly large) value that follows it; see _record()
+_VERSION_HEADER = re.compile(rb'\s*(?:\[|\{\s*"version"\s*:)\s*(\d+)')
+_VERSION_HEADER_SIZE = 64
+
+# JSON state files larger than this are streamed by iter_value() rather than
+# parsed in one go, in batches of _STREAM_BATCH_SIZE items per thread hop
+_STREAM_THRESHOLD = 1 << 20
+_STREAM_BATCH_SIZE = 256
+
+# O_EXCL: every write gets a fresh temp file, never one another writer holds
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+# Read-modify-write attempts StateBackend._apply makes before giving up
+_APPLY_ATTEMPTS = 100
+
+
+def _next_state(
+    key: str,
+    current: State | None,
+    fn: Callable[[Any], Any],
+    default: Any
+) -> State:
+    """Build the state that follows ``current`` once ``fn`` is applied."""
+    if current is None:
+        return State(key=key, value=fn(default), version=1, metadata={})
+    return State(
+        key=key,
+        value=fn(current.value),
+        version=current.version + 1,
+        metadata=current.metadata
+    )
+
+
+def _appended(key: str, items: Any, item: Any) -> list[Any]:
+    if not isinstance(items, list):
+        raise TypeError(f"State {key!r} does not hold a list")
+    return [*items, item]
+
+
+def _record(state: State) -> tuple[int, str, dict[str, Any], Any]:
+    """Lay a state out for storage as ``[version, key, metadata, value]``.
+    
+    A positional record is serialized straight from the fields, without
+    building a dict and writing its four field names into every file.
+    """
+    return (state.version, state.key, state.metadata, state.value)
+
+
+def _labelled_record(state: State) -> dict[str, Any]:
+    """Lay a state out as a JSON object, for ``pretty`` files meant for people."""
+    return {
+        "version": state.version,
+        "key": state.key,
+        "metadata": state.metadata,
+        "value": state.value
+    }
+
+
+def _from_record(data: Any) -> State:
+    """Rebuild a state from either record layout."""
+    if isinstance(data, dict):
+        return State(
+            key=data["key"],
+            value=data["value"],
+            version=data.get("version", 1),
+            metadata=data.get("metadata", {})
+        )
+    version, key, metadata, value = data
+    return State(key=key, value=value, version=version, metadata=metadata)
+
+
+# ijson events that begin a JSON value
+_VALUE_STARTS = frozenset(("start_map", "start_array", "string", "number", "boolean", "null"))
+
+
+def _value_items(f: BinaryIO, positional: bool) -> Iterator[Any]:
+    """Stream the items of a JSON state file's value, if that value is a list.
+    
+    Yields nothing for any other value. Only events inside the value are
+    matched, so lists elsewhere in the record (in metadata, say) or dict
+    entries that happen to be called "item" are never mistaken for it.
+    """
+    events = ijson.parse(f, use_float=True)
+    # The value is the last of a positional record's four elements, or
+    # the "value" field of a labelled (pretty or older) file
+    prefix = "item" if positional else "value"
+    seen = 0
+    for path, event, _ in events:
+        if path == prefix and event in _VALUE_STARTS:
+            seen += 1
+            if not positional or seen == 4:
+                if event != "start_array":
+                    return
+                break
+    else:
+        return
+    
+    def value_events() -> Iterator[tuple[str, str, Any]]:
+        for path, event, value in events:
+            if path == prefix and event == "end_array":
+                return
+            yield path, event, value
+    
+    yield from ijson.items(value_events(), f"{prefix}.item")
+
+
+def _take(iterator: Any, n: int) -> list[Any]:
+    """Pull up to ``n`` items from an iterator."""
+    return list(islice(iterator, n))
+
+
+def _write_file(path: Path, payload: bytes, fsync: bool = False) -> None:
+    """Atomically replace a whole file with raw os calls.
+    
+    The payload goes to a temporary sibling that is then renamed over
+    ``path``, so a crash mid-write leaves either the old file or the new
+    one, never a truncated mix. It is already complete in memory, so it
+    normally goes out in a single write() syscall. With ``fsync`` the data
+    is flushed to disk before the rename.
+    """
+    # Unique per call: backends in other threads or processes may be
+    # writing the same key at the same time
+    tmp = path.with_name(f"{path.name}.{os.urandom(8).hex()}.tmp")
+    fd = os.open(tmp, _WRITE_FLAGS, 0o644)
+    try:
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+def _fsync_dir(path: Path) -> None:
+    """Flush a directory's entries, making renames into it durable."""
+    if os.name != "posix":
+        return  # Directories cannot be opened for fsync on Windows
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@dataclass(slots=True)
 class State:
     """Agent state container.
     
+    Uses ``__slots__``: backends create one per read, so skipping the
+    per-instance ``__dict__`` keeps them small and quick to build.
+    
     Attributes:
         key: State identifier
         value: State data (must be JSON serializable)
@@ -40,10 +283,18 @@ class State:
             self.metadata = {}
 
 
+# A read-modify-write step: the next state given the current one, or None
+# to leave the key untouched
+_Step = Callable[[State | None], State | None]
+
+
 class StateBackend(ABC):
     """Abstract base class for state storage backends.
     
     Implementations can use Redis, PostgreSQL, file system, etc.
+    ``FileStateBackend`` suits development and single-node agents; for
+    several replicas sharing state use ``RedisStateBackend`` from
+    ``kimi_agent_sdk.connectors.state_redis``.
     """
     
     @abstractmethod
@@ -61,6 +312,86 @@ class StateBackend(ABC):
         """Delete state. Returns True if deleted."""
         pass
     
+    async def get_version(self, key: str) -> int | None:
+        """Return the current version of a key, or None if it is absent.
+        
+        Backends that can read the version without loading the value
+        should override this.
+        """
+        state = await self.get(key)
+        return state.version if state else None
+    
+    async def iter_value(self, key: str) -> AsyncIterator[Any]:
+        """Yield the items of a list-valued state one at a time.
+        
+        Yields nothing if the key is absent and raises TypeError if its
+        value is not a list. Backends that can parse a stored list
+        incrementally should override this.
+        """
+        state = await self.get(key)
+        if state is None:
+            return
+        if not isinstance(state.value, list):
+            raise TypeError(f"State {key!r} does not hold a list")
+        for item in state.value:
+            yield item
+    
+    async def compare_and_set(self, key: str, expected_version: int, value: Any) -> bool:
+        """Replace a state's value if its version is still ``expected_version``.
+        
+        The stored metadata is kept and the version bumped. Returns False
+        if the key is absent or has moved on to another version.
+        """
+        def step(current: State | None) -> State | None:
+            if current is None or current.version != expected_version:
+                return None  # Version conflict
+            return _next_state(key, current, lambda _: value, None)
+        
+        return await self._apply(key, step) is not None
+    
+    async def append(self, key: str, item: Any) -> int:
+        """Append an item to a list-valued state, creating it if absent.
+        
+        Returns the new length of the list. Raises TypeError if the value
+        is not a list.
+        """
+        state = await self._update(key, lambda items: _appended(key, items, item), [])
+        return len(state.value)
+    
+    async def atomic_increment(self, key: str, amount: int = 1) -> int:
+        """Add ``amount`` to a numeric state, starting from 0 if absent.
+        
+        Returns the new value.
+        """
+        state = await self._update(key, lambda value: value + amount, 0)
+        return state.value
+    
+    async def _update(self, key: str, fn: Callable[[Any], Any], default: Any) -> State:
+        """Apply ``fn`` to a key's value as one versioned read-modify-write."""
+        state = await self._apply(key, lambda current: _next_state(key, current, fn, default))
+        assert state is not None  # _next_state always produces a state
+        return state
+    
+    async def _apply(self, key: str, step: _Step) -> State | None:
+        """Store ``step(current state)`` unless it returns None.
+        
+        The default retries while ``set()`` loses to another writer, up to
+        ``_APPLY_ATTEMPTS`` times, and raises RuntimeError if it fails for
+        any other reason; backends that can do the whole step in one call
+        or under a lock override it.
+        """
+        for _ in range(_APPLY_ATTEMPTS):
+            current = await self.get(key)
+            state = step(current)
+            if state is None or await self.set(state):
+                return state
+            # Only retry if the key really moved on since we read it
+            read_version = current.version if current else None
+            if await self.get_version(key) == read_version:
+                raise RuntimeError(f"Backend refused to store state {key!r}")
+            await asyncio.sleep(0)
+        raise RuntimeError(f"Gave up updating state {key!r} after {_APPLY_ATTEMPTS} conflicts")
+    
     @abstractmethod
     async def list_keys(self, prefix: str = "") -> list[str]:
         """List all state keys with optional prefix filter."""
@@ -77,84 +408,378 @@ class FileStateBackend(StateBackend):
     
     Simple backend that stores state as JSON files.
     Good for development and single-node deployments.
+    
+    Pass ``format="msgpack"`` (requires the ``msgpack`` package) to store
+    compact binary files instead; they are smaller and faster to parse
+    than JSON but no longer human-readable.
+    
+    With ``flush_interval`` set, writes are buffered in memory and written
+    out together after that many seconds, so bursts of updates (counters,
+    event handlers) collapse into one batch of I/O. Reads see buffered
+    writes immediately; call ``flush()`` when the data must be on disk.
+    
+    With ``index_keys`` the directory is scanned once up front and key
+    names are then tracked in memory, so ``list_keys()`` only looks at
+    keys sharing the prefix's first two characters instead of listing the
+    whole directory. Only use it when this backend is the sole writer of
+    ``base_dir``; files created by other processes would go unseen.
     """
     
-    def __init__(self, base_dir: str | Path = "./.agent_state") -> None:
+    def __init__(
+        self,
+        base_dir: str | Path = "./.agent_state",
+        *,
+        pretty: bool = False,
+        flush_interval: float = 0.0,
+        format: Literal["json", "msgpack"] = "json",
+        fsync: bool = False,
+        index_keys: bool = False
+    ) -> None:
         """Initialize file backend.
         
         Args:
             base_dir: Directory to store state files
+            pretty: Indent the JSON files for easier debugging
+            flush_interval: Seconds to buffer writes before flushing them
+                as one batch; 0 writes every state through immediately
+            format: On-disk encoding, ``"json"`` or ``"msgpack"``
+            fsync: Flush every write to disk before it counts as done, so
+                states survive a power loss as well as a process crash;
+                much slower, so off by default
+            index_keys: Keep an in-memory index of key names for
+                ``list_keys()`` instead of scanning the directory each call
         """
+        _check_format(format)
         self.base_dir = Path(base_dir)
+        self.pretty = pretty
+        self.format = format
+        self.fsync = fsync
+        self._suffix = f".{format}"
+        self.flush_interval = flush_interval
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        # Buffered writes, and the batch currently being written out
+        self._pending: dict[str, State] = {}
+        self._flushing: dict[str, State] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task[None] | None = None
+        # One lock per key so read-check-write sequences on the same key are
+        # serialized while different keys proceed in parallel; a lock is
+        # dropped as soon as nothing holds or waits on it
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        # Stored key names bucketed by their first two characters
+        self._key_index: dict[str, set[str]] | None = None
+        if index_keys:
+            self._key_index = {}
+            for name in self._list_keys(""):
+                self._key_index.setdefault(name[:2], set()).add(name)
+    
+    def _safe_key(self, key: str) -> str:
+        """Sanitize a key for use as a file name."""
+        return key.replace("/", "_").replace("\\", "_")
     
     def _file_path(self, key: str) -> Path:
         """Get file path for a key."""
-        # Sanitize key for filesystem
-        safe_key = key.replace("/", "_").replace("\\", "_")
-        return self.base_dir / f"{safe_key}.json"
+        return self.base_dir / f"{self._safe_key(key)}{self._suffix}"
     
     async def get(self, key: str) -> State | None:
         """Retrieve state from file."""
-        file_path = self._file_path(key)
+        buffered = self._pending.get(key) or self._flushing.get(key)
+        if buffered is not None:
+            return buffered
+        return await asyncio.to_thread(self._read, self._file_path(key))
+    
+    async def get_version(self, key: str) -> int | None:
+        """Read only the version header of a state file."""
+        buffered = self._pending.get(key) or self._flushing.get(key)
+        if buffered is not None:
+            return buffered.version
+        return await asyncio.to_thread(self._read_version, self._file_path(key))
+    
+    async def iter_value(self, key: str) -> AsyncIterator[Any]:
+        """Yield the items of a list-valued state one at a time.
         
-        if not file_path.exists():
-            return None
+        JSON files over 1 MiB are stream-parsed with ``ijson`` when it is
+        installed, so only a batch of items is in memory at once instead of
+        the file's text plus the whole decoded list.
+        """
+        file_path = self._file_path(key)
+        if (
+            ijson is None
+            or self.format != "json"
+            or key in self._pending
+            or key in self._flushing
+            or not await asyncio.to_thread(self._is_large, file_path)
+        ):
+            async for item in super().iter_value(key):
+                yield item
+            return
         
         try:
-            data = json.loads(file_path.read_text())
-            return State(
-                key=data["key"],
-                value=data["value"],
-                version=data.get("version", 1),
-                metadata=data.get("metadata", {})
-            )
-        except (json.JSONDecodeError, KeyError):
-            return None
+            f, items = await asyncio.to_thread(self._open_items, file_path)
+        except FileNotFoundError:
+            return
+        streamed = False
+        try:
+            while batch := await asyncio.to_thread(_take, items, _STREAM_BATCH_SIZE):
+                streamed = True
+                for item in batch:
+                    yield item
+        finally:
+            f.close()
+        if not streamed:
+            # An empty list, or a value that is not a list at all
+            async for item in super().iter_value(key):
+                yield item
     
     async def set(self, state: State) -> bool:
         """Store state to file."""
+        async with self._lock(state.key):
+            if self.flush_interval <= 0:
+                stored = await asyncio.to_thread(self._write, state)
+                if stored:
+                    self._index_add(state.key)
+                return stored
+            
+            # Check version for optimistic locking
+            existing = await self.get(state.key)
+            if existing and existing.version != state.version - 1:
+                return False  # Version conflict
+            
+            self._buffer(state)
+            return True
+    
+    async def _apply(self, key: str, step: _Step) -> State | None:
+        # The per-key lock makes read-modify-write a single step, so there is
+        # nothing to retry; unbuffered, it is also a single thread hop
+        async with self._lock(key):
+            if self.flush_interval <= 0:
+                state = await asyncio.to_thread(self._apply_file, key, step)
+                if state is not None:
+                    self._index_add(key)
+                return state
+            state = step(await self.get(key))
+            if state is not None:
+                self._buffer(state)
+            return state
+    
+    def _buffer(self, state: State) -> None:
+        """Queue a state for the next batched flush."""
+        self._index_add(state.key)
+        self._pending[state.key] = state
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+    
+    def _index_add(self, key: str) -> None:
+        if self._key_index is not None:
+            name = self._safe_key(key)
+            self._key_index.setdefault(name[:2], set()).add(name)
+    
+    def _lock(self, key: str) -> asyncio.Lock:
+        """Return the lock guarding ``key``, creating it on first use."""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+    
+    async def flush(self) -> None:
+        """Write all buffered states to disk.
+        
+        Waits for a flush that is already in progress, so once this returns
+        every earlier ``set()`` is on disk.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            if self._flush_task is not None:
+                # Everything it was waiting for is in this batch
+                self._flush_task.cancel()
+                self._flush_task = None
+            try:
+                await asyncio.to_thread(self._store_many, list(self._flushing.values()))
+            except BaseException:
+                # Requeue whatever a newer set() has not already replaced
+                for key, state in self._flushing.items():
+                    self._pending.setdefault(key, state)
+                raise
+            finally:
+                self._flushing = {}
+    
+    async def _flush_later(self) -> None:
+        task = asyncio.current_task()
+        try:
+            await asyncio.sleep(self.flush_interval)
+        finally:
+            # flush() may have cancelled us and a newer set() started the
+            # next timer since; that one must stay registered
+            if self._flush_task is task:
+                self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Nobody awaits this task, so report the error here; the batch
+            # was requeued and is retried after another interval
+            print(f"State flush error: {e}")
+            if self._pending and self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_later())
+    
+    async def delete(self, key: str) -> bool:
+        """Delete state file."""
+        await self.flush()
+        async with self._lock(key):
+            deleted = await asyncio.to_thread(self._delete, self._file_path(key))
+            if self._key_index is not None:
+                name = self._safe_key(key)
+                self._key_index.get(name[:2], set()).discard(name)
+            return deleted
+    
+    async def list_keys(self, prefix: str = "") -> list[str]:
+        """List all state keys."""
+        await self.flush()
+        index = self._key_index
+        if index is None:
+            return await asyncio.to_thread(self._list_keys, prefix)
+        if len(prefix) >= 2:
+            bucket = index.get(prefix[:2], ())
+            return [name for name in bucket if name.startswith(prefix)]
+        # Shorter prefixes span several buckets; pick those that can match
+        return [
+            name
+            for head, bucket in index.items()
+            if head.startswith(prefix)
+            for name in bucket
+        ]
+    
+    async def clear(self) -> int:
+        """Clear all state files."""
+        await self.flush()
+        count = await asyncio.to_thread(self._clear)
+        if self._key_index is not None:
+            self._key_index.clear()
+        return count
+    
+    # The blocking halves of the methods above run in a worker thread so
+    # that disk latency never stalls the event loop.
+    
+    def _read(self, file_path: Path) -> State | None:
+        try:
+            return _from_record(_decode(file_path.read_bytes(), self.format))
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            # ValueError covers JSON and msgpack decode errors alike
+            return None
+    
+    def _open_items(self, file_path: Path) -> tuple[BinaryIO, Iterator[Any]]:
+        f = file_path.open("rb")
+        positional = f.read(1) == b"["
+        f.seek(0)
+        return f, _value_items(f, positional)
+    
+    def _is_large(self, file_path: Path) -> bool:
+        try:
+            return file_path.stat().st_size > _STREAM_THRESHOLD
+        except FileNotFoundError:
+            return False
+    
+    def _write(self, state: State) -> bool:
         file_path = self._file_path(state.key)
         
         # Check version for optimistic locking
-        existing = await self.get(state.key)
-        if existing and existing.version != state.version - 1:
+        existing = self._read_version(file_path)
+        if existing is not None and existing != state.version - 1:
             return False  # Version conflict
         
-        data = {
-            "key": state.key,
-            "value": state.value,
-            "version": state.version,
-            "metadata": state.metadata
-        }
-        
-        file_path.write_text(json.dumps(data, indent=2))
+        self._store(file_path, state)
         return True
     
-    async def delete(self, key: str) -> bool:
-        """Delete state file."""
+    def _apply_file(self, key: str, step: _Step) -> State | None:
         file_path = self._file_path(key)
-        
-        if file_path.exists():
+        state = step(self._read(file_path))
+        if state is not None:
+            self._store(file_path, state)
+        return state
+    
+    def _read_version(self, file_path: Path) -> int | None:
+        try:
+            with file_path.open("rb") as f:
+                head = f.read(_VERSION_HEADER_SIZE)
+        except FileNotFoundError:
+            return None
+        version = self._decode_version(head)
+        if version is not None:
+            return version
+        # Files written before the version moved to the front
+        state = self._read(file_path)
+        return state.version if state else None
+    
+    def _decode_version(self, head: bytes) -> int | None:
+        if self.format == "msgpack":
+            unpacker = msgpack.Unpacker(raw=False)
+            unpacker.feed(head)
+            try:
+                try:
+                    unpacker.read_array_header()
+                except ValueError:
+                    # A map led by its "version" key/value pair
+                    unpacker = msgpack.Unpacker(raw=False)
+                    unpacker.feed(head)
+                    unpacker.read_map_header()
+                    if unpacker.unpack() != "version":
+                        return None
+                version = unpacker.unpack()
+            except (msgpack.OutOfData, ValueError):
+                return None
+            return version if isinstance(version, int) else None
+        match = _VERSION_HEADER.match(head)
+        return int(match[1]) if match else None
+    
+    def _store(self, file_path: Path, state: State) -> None:
+        self._write_record(file_path, state)
+        if self.fsync:
+            _fsync_dir(self.base_dir)
+    
+    def _store_many(self, states: list[State]) -> None:
+        for state in states:
+            self._write_record(self._file_path(state.key), state)
+        if self.fsync and states:
+            # One directory flush covers every rename in the batch
+            _fsync_dir(self.base_dir)
+    
+    def _write_record(self, file_path: Path, state: State) -> None:
+        # Version goes first so _read_version only needs the file's head
+        data = _labelled_record(state) if self.pretty else _record(state)
+        _write_file(file_path, _encode(data, self.format, self.pretty), self.fsync)
+    
+    def _delete(self, file_path: Path) -> bool:
+        try:
             file_path.unlink()
-            return True
-        return False
+        except FileNotFoundError:
+            return False
+        return True
     
-    async def list_keys(self, prefix: str = "") -> list[str]:
-        """List all state keys."""
+    # scandir yields DirEntry objects whose type comes from the directory
+    # listing itself, so neither loop stats files or builds Path objects
+    
+    def _list_keys(self, prefix: str) -> list[str]:
+        suffix = self._suffix
+        cut = -len(suffix)
         keys = []
-        for file_path in self.base_dir.glob("*.json"):
-            key = file_path.stem
-            if key.startswith(prefix):
-                keys.append(key)
+        with os.scandir(self.base_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(suffix) and name[:cut].startswith(prefix) and entry.is_file():
+                    keys.append(name[:cut])
         return keys
     
-    async def clear(self) -> int:
-        """Clear all state files."""
+    def _clear(self) -> int:
+        suffix = self._suffix
         count = 0
-        for file_path in self.base_dir.glob("*.json"):
-            file_path.unlink()
-            count += 1
+        with os.scandir(self.base_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.is_file():
+                    os.unlink(entry.path)
+                    count += 1
         return count
 
 
@@ -186,13 +811,23 @@ class StateManager:
         ```
     """
     
-    def __init__(self, backend: StateBackend | None = None) -> None:
+    def __init__(
+        self,
+        backend: StateBackend | None = None,
+        *,
+        cache_size: int = 0
+    ) -> None:
         """Initialize state manager.
         
         Args:
             backend: Storage backend (defaults to FileStateBackend)
+            cache_size: Number of recently used states to keep in memory.
+                The cache is write-through, so it is only safe when this
+                manager is the sole writer of the backend; 0 disables it.
         """
         self.backend = backend or FileStateBackend()
+        self._cache: OrderedDict[str, State] = OrderedDict()
+        self._cache_size = cache_size
     
     async def get(self, key: str, default: T = None) -> T:
         """Get state value by key.
@@ -204,7 +839,7 @@ class StateManager:
         Returns:
             State value or default
         """
-        state = await self.backend.get(key)
+        state = await self.get_state_obj(key)
         return state.value if state else default
     
     async def set(
@@ -220,8 +855,8 @@ class StateManager:
             value: Value to store (must be JSON serializable)
             metadata: Optional metadata
         """
-        existing = await self.backend.get(key)
-        version = existing.version + 1 if existing else 1
+        current = await self._current_version(key)
+        version = current + 1 if current is not None else 1
         
         state = State(
             key=key,
@@ -230,7 +865,7 @@ class StateManager:
             metadata=metadata or {}
         )
         
-        await self.backend.set(state)
+        await self._store(state)
     
     async def update(
         self,
@@ -248,12 +883,15 @@ class StateManager:
         Returns:
             True if update succeeded, False if version conflict
         """
-        existing = await self.backend.get(key)
-        
         if version is not None:
-            if not existing or existing.version != version:
+            cached = self._cache.get(key)
+            if cached is not None and cached.version != version:
                 return False  # Version conflict
+            # The backend checks the version and writes in one operation
+            self._cache.pop(key, None)
+            return await self.backend.compare_and_set(key, version, value)
         
+        existing = await self.get_state_obj(key)
         new_version = existing.version + 1 if existing else 1
         
         state = State(
@@ -263,7 +901,7 @@ class StateManager:
             metadata=existing.metadata if existing else {}
         )
         
-        return await self.backend.set(state)
+        return await self._store(state)
     
     async def delete(self, key: str) -> bool:
         """Delete state.
@@ -274,6 +912,7 @@ class StateManager:
         Returns:
             True if deleted, False if not found
         """
+        self._cache.pop(key, None)
         return await self.backend.delete(key)
     
     async def exists(self, key: str) -> bool:
@@ -285,8 +924,29 @@ class StateManager:
         Returns:
             True if state exists
         """
-        state = await self.backend.get(key)
-        return state is not None
+        # Only the version header is needed, not a materialized State
+        return await self._current_version(key) is not None
+    
+    async def iter_value(self, key: str) -> AsyncIterator[Any]:
+        """Iterate over the items of a list-valued state.
+        
+        Lets consumers of long lists (message histories, logs) process
+        them incrementally; backends that support it stream the items
+        from storage instead of loading the whole value.
+        
+        Args:
+            key: State key
+            
+        Yields:
+            Items of the stored list; nothing if the key is absent
+        """
+        cached = self._cache.get(key)
+        if cached is not None and isinstance(cached.value, list):
+            for item in cached.value:
+                yield item
+            return
+        async for item in self.backend.iter_value(key):
+            yield item
     
     async def increment(self, key: str, amount: int = 1) -> int:
         """Atomically increment a counter.
@@ -298,10 +958,23 @@ class StateManager:
         Returns:
             New counter value
         """
-        current = await self.get(key, 0)
-        new_value = current + amount
-        await self.set(key, new_value)
-        return new_value
+        # The backend reads, adds and writes in one step; our cached copy
+        # would be stale afterwards
+        self._cache.pop(key, None)
+        return await self.backend.atomic_increment(key, amount)
+    
+    async def append(self, key: str, item: Any) -> int:
+        """Append an item to a list, creating the list if needed.
+        
+        Args:
+            key: List key
+            item: Item to append
+            
+        Returns:
+            New length of the list
+        """
+        self._cache.pop(key, None)
+        return await self.backend.append(key, item)
     
     async def list(self, prefix: str = "") -> list[str]:
         """List all state keys with optional prefix.
@@ -320,6 +993,7 @@ class StateManager:
         Returns:
             Number of states cleared
         """
+        self._cache.clear()
         return await self.backend.clear()
     
     async def get_state_obj(self, key: str) -> State | None:
@@ -331,13 +1005,49 @@ class StateManager:
         Returns:
             State object or None
         """
-        return await self.backend.get(key)
+        if self._cache_size:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+        
+        state = await self.backend.get(key)
+        if state is not None:
+            self._remember(state)
+        return state
+    
+    async def _current_version(self, key: str) -> int | None:
+        """Look up a key's version, from the cache when possible."""
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached.version
+        return await self.backend.get_version(key)
+    
+    async def _store(self, state: State) -> bool:
+        """Write a state through to the backend, keeping the cache in step."""
+        stored = await self.backend.set(state)
+        if stored:
+            self._remember(state)
+        else:
+            # Someone else moved the key on; our cached copy is stale
+            self._cache.pop(state.key, None)
+        return stored
+    
+    def _remember(self, state: State) -> None:
+        """Insert a state into the LRU cache, evicting the oldest entry."""
+        if not self._cache_size:
+            return
+        self._cache[state.key] = state
+        self._cache.move_to_end(state.key)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
 
 
 # Decorator for stateful functions
 def stateful(
     state_manager: StateManager,
-    key_prefix: str = ""
+    key_prefix: str = "",
+    key_fn: Callable[..., Any] | None = None
 ):
     """Decorator to make a function stateful.
     
@@ -346,6 +1056,9 @@ def stateful(
     Args:
         state_manager: State manager instance
         key_prefix: Prefix for state keys
+        key_fn: Optional function called with the wrapped function's
+            arguments that returns the per-call part of the state key.
+            Defaults to the repr of the positional arguments.
         
     Example:
         ```python
@@ -369,12 +1082,15 @@ def stateful(
         ```
     """
     def decorator(func):
+        # The prefix and function name are fixed, so build that part once
+        key_base = f"{key_prefix}:{func.__name__}:"
+        
         async def wrapper(*args, **kwargs):
             # Generate state key from function name and arguments
-            key = f"{key_prefix}:{func.__name__}:{hash(str(args))}"
-            
-            # Load existing state
-            existing = await state_manager.get_state_obj(key)
+            # repr keeps equal-hashing arguments such as 1, 1.0 and True
+            # apart; a key_fn can supply something shorter when needed
+            arg_key = key_fn(*args, **kwargs) if key_fn is not None else repr(args)
+            key = f"{key_base}{arg_key}"
             
             # Call function
             result = await func(*args, **kwargs)
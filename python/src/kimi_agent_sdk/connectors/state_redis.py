@@ -0,0 +1,211 @@
+"""
+Redis state backend for persistent agents.
+
+``FileStateBackend`` keeps state on one machine's disk, so every replica of
+a multi-replica deployment sees its own copy. ``RedisStateBackend`` stores
+state in a shared Redis server instead and is the backend to use once an
+agent runs on more than one node.
+
+Requires the ``redis`` package (``pip install redis``); it is not a
+dependency of the SDK, which is why this module is not imported by
+``kimi_agent_sdk.connectors``.
+
+Example:
+    ```python
+    from kimi_agent_sdk.connectors import StateManager
+    from kimi_agent_sdk.connectors.state_redis import RedisStateBackend
+
+    backend = RedisStateBackend("redis://localhost:6379/0")
+    state = StateManager(backend)
+    await state.set("conversation:123", {"messages": []})
+    ...
+    await backend.close()
+    ```
+"""
+
+from __future__ import annotations
+
+from typing import Any, Literal
+
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+from kimi_agent_sdk.connectors.state import (
+    State,
+    StateBackend,
+    _check_format,
+    _decode,
+    _encode,
+    _Step,
+)
+
+# Characters SCAN's MATCH pattern treats as glob syntax
+_GLOB_SPECIAL = str.maketrans({c: f"\\{c}" for c in "\\*?[]"})
+
+# Keys deleted per UNLINK call by clear()
+_CLEAR_BATCH_SIZE = 500
+
+_FIELDS = ["version", "metadata", "value"]
+
+# compare_and_set in one round trip: bump the version and replace the value
+# only if the stored version is still the expected one
+_COMPARE_AND_SET = """
+if redis.call("HGET", KEYS[1], "version") ~= ARGV[1] then
+    return 0
+end
+redis.call("HSET", KEYS[1], "version", ARGV[2], "value", ARGV[3])
+return 1
+"""
+
+
+class RedisStateBackend(StateBackend):
+    """Redis-based state storage.
+
+    Each state is a Redis hash under ``namespace + key`` with the fields
+    ``version``, ``metadata`` and ``value``, so versions can be checked and
+    values replaced without touching the rest of the state.
+
+    Writes are guarded with WATCH/MULTI/EXEC, so concurrent writers on any
+    number of replicas get the same optimistic-locking behaviour as with
+    ``FileStateBackend``: a stale version makes ``set()`` return False.
+
+    The client must return raw bytes (the default ``decode_responses=False``).
+    """
+
+    def __init__(
+        self,
+        client: Redis | str = "redis://localhost:6379/0",
+        *,
+        namespace: str = "agent_state:",
+        format: Literal["json", "msgpack"] = "json",
+    ) -> None:
+        """Initialize Redis backend.
+
+        Args:
+            client: A ``redis.asyncio.Redis`` client, or a URL to create one
+                from; a client created here is closed by ``close()``
+            namespace: Prefix for every Redis key this backend touches
+            format: Encoding of the stored state, ``"json"`` or ``"msgpack"``
+        """
+        _check_format(format)
+        self._owns_client = isinstance(client, str)
+        self._redis: Redis = Redis.from_url(client) if isinstance(client, str) else client
+        self.namespace = namespace
+        self.format = format
+        self._compare_and_set = self._redis.register_script(_COMPARE_AND_SET)
+
+    def _name(self, key: str) -> str:
+        """Get the Redis key for a state key."""
+        return self.namespace + key
+
+    async def get(self, key: str) -> State | None:
+        """Retrieve state from Redis."""
+        return self._to_state(key, await self._redis.hmget(self._name(key), _FIELDS))
+
+    async def get_version(self, key: str) -> int | None:
+        """Read only the version field of a state."""
+        version = await self._redis.hget(self._name(key), "version")
+        return int(version) if version is not None else None
+
+    async def set(self, state: State) -> bool:
+        """Store state in Redis."""
+        name = self._name(state.key)
+        fields = self._fields(state)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(name)
+
+                # Check version for optimistic locking
+                current = await pipe.hget(name, "version")
+                if current is not None and int(current) != state.version - 1:
+                    return False  # Version conflict
+
+                pipe.multi()
+                pipe.hset(name, mapping=fields)
+                await pipe.execute()
+            except WatchError:
+                return False  # Another writer got in between
+        return True
+
+    async def compare_and_set(self, key: str, expected_version: int, value: Any) -> bool:
+        """Replace a state's value if its version is still ``expected_version``."""
+        replaced = await self._compare_and_set(
+            keys=[self._name(key)],
+            args=[expected_version, expected_version + 1, _encode(value, self.format)],
+        )
+        return bool(replaced)
+
+    async def _apply(self, key: str, step: _Step) -> State | None:
+        # Read and write inside one WATCH transaction instead of a get()
+        # followed by a separately watched set()
+        name = self._name(key)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(name)
+                    state = step(self._to_state(key, await pipe.hmget(name, _FIELDS)))
+                    if state is None:
+                        return None
+                    pipe.multi()
+                    pipe.hset(name, mapping=self._fields(state))
+                    await pipe.execute()
+                    return state
+                except WatchError:
+                    continue  # Another writer got in between; try again
+
+    async def delete(self, key: str) -> bool:
+        """Delete state from Redis."""
+        return await self._redis.delete(self._name(key)) > 0
+
+    async def list_keys(self, prefix: str = "") -> list[str]:
+        """List all state keys."""
+        # SCAN walks the keyspace incrementally instead of blocking the
+        # server the way KEYS does
+        start = len(self.namespace)
+        return [
+            name.decode()[start:]
+            async for name in self._redis.scan_iter(match=self._match(prefix), count=1000)
+        ]
+
+    async def clear(self) -> int:
+        """Clear all states in this backend's namespace."""
+        count = 0
+        batch: list[bytes] = []
+        async for name in self._redis.scan_iter(match=self._match(""), count=1000):
+            batch.append(name)
+            if len(batch) >= _CLEAR_BATCH_SIZE:
+                count += await self._redis.unlink(*batch)
+                batch = []
+        if batch:
+            count += await self._redis.unlink(*batch)
+        return count
+
+    async def close(self) -> None:
+        """Close the Redis client if this backend created it."""
+        if self._owns_client:
+            await self._redis.aclose()
+
+    def _fields(self, state: State) -> dict[str, Any]:
+        return {
+            "version": state.version,
+            "metadata": _encode(state.metadata, self.format),
+            "value": _encode(state.value, self.format),
+        }
+
+    def _to_state(self, key: str, fields: list[bytes | None]) -> State | None:
+        version, metadata, value = fields
+        if version is None or metadata is None or value is None:
+            return None
+        try:
+            return State(
+                key=key,
+                value=_decode(value, self.format),
+                version=int(version),
+                metadata=_decode(metadata, self.format),
+            )
+        except ValueError:
+            return None
+
+    def _match(self, prefix: str) -> str:
+        """Build a SCAN pattern for keys starting with ``prefix``."""
+        return (self.namespace + prefix).translate(_GLOB_SPECIAL) + "*"
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+import math
 import tempfile
 from pathlib import Path
 
@@ -10,6 +11,7 @@ import pytest
 
 from kimi_agent_sdk.connectors import Event, EventBus, StateManager, FileStateBackend
 from kimi_agent_sdk.connectors.events import TimerSource
+from kimi_agent_sdk.connectors.state import State, stateful
 
 
 class TestEvent:
@@ -36,6 +38,16 @@ class TestEvent:
         assert event.data == {}
         assert event.source == "unknown"
 
+    def test_event_data_not_copied(self) -> None:
+        """Test that the payload is owned by the event, not copied."""
+        data = {"key": "value"}
+        event = Event(type="test.event", data=data)
+        
+        assert event.data is data
+        copied = event.copy_data()
+        assert copied == data
+        assert copied is not data
+
 
 class TestEventBus:
     """Tests for EventBus."""
@@ -89,6 +101,28 @@ class TestEventBus:
         assert "test.event1" in received
         assert "test.event2" in received
 
+    @pytest.mark.asyncio
+    async def test_wildcard_segments(self) -> None:
+        """Test that each wildcard matches exactly one segment."""
+        bus = EventBus()
+        middle = []
+        everything = []
+        
+        @bus.on("github.*.created")
+        def on_created(event: Event) -> None:
+            middle.append(event.type)
+        
+        @bus.on("*")
+        def on_any(event: Event) -> None:
+            everything.append(event.type)
+        
+        await bus.emit(Event(type="github.pr.created"))
+        await bus.emit(Event(type="github.pr.review.created"))
+        await bus.emit(Event(type="github.pr.closed"))
+        
+        assert middle == ["github.pr.created"]
+        assert len(everything) == 3
+
     @pytest.mark.asyncio
     async def test_multiple_handlers(self) -> None:
         """Test multiple handlers for same event."""
@@ -148,6 +182,59 @@ class TestEventBus:
         
         assert len(received) == 1
 
+    @pytest.mark.asyncio
+    async def test_late_registration_after_emit(self) -> None:
+        """Test handlers registered after an emit still receive later events."""
+        bus = EventBus()
+        received = []
+        
+        await bus.emit(Event(type="test.event"))
+        
+        @bus.on("test.*")
+        def handler(event: Event) -> None:
+            received.append(event.type)
+        
+        await bus.emit(Event(type="test.event"))
+        bus.off("test.*", handler)
+        await bus.emit(Event(type="test.event"))
+        
+        assert received == ["test.event"]
+
+    @pytest.mark.asyncio
+    async def test_emit_nowait(self) -> None:
+        """Test fire-and-forget emit schedules handlers on the loop."""
+        bus = EventBus()
+        received = []
+        
+        @bus.on("test.event")
+        async def handler(event: Event) -> None:
+            received.append(event.type)
+        
+        bus.emit_nowait(Event(type="test.event"))
+        assert received == []
+        
+        await asyncio.sleep(0.01)
+        assert received == ["test.event"]
+        assert len(bus.get_history()) == 1
+
+    @pytest.mark.asyncio
+    async def test_plain_callable_returning_coroutine(self) -> None:
+        """Test a non-async callable whose result is a coroutine is awaited."""
+        bus = EventBus()
+        received = []
+        
+        async def record(event: Event) -> None:
+            received.append(event.type)
+        
+        bus.on("test.event")(lambda event: record(event))
+        
+        await bus.emit(Event(type="test.event"))
+        assert received == ["test.event"]
+        
+        bus.emit_nowait(Event(type="test.event"))
+        await asyncio.sleep(0.01)
+        assert received == ["test.event", "test.event"]
+
     def test_handler_count(self) -> None:
         """Test counting registered handlers."""
         bus = EventBus()
@@ -251,6 +338,25 @@ class TestStateManager:
             success = await state.update("key", "value3", version=1)
             assert not success
 
+    @pytest.mark.asyncio
+    async def test_compare_and_set(self) -> None:
+        """Test versioned updates race safely and keep metadata."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for backend in (FileStateBackend(tmpdir), FileStateBackend(tmpdir, flush_interval=60)):
+                state = StateManager(backend)
+                await state.set("key", "value1", metadata={"source": "test"})
+                version = (await state.get_state_obj("key")).version
+                
+                results = await asyncio.gather(
+                    *(state.update("key", f"value{i}", version=version) for i in range(5))
+                )
+                assert results.count(True) == 1
+                
+                obj = await state.get_state_obj("key")
+                assert obj.version == version + 1
+                assert obj.metadata == {"source": "test"}
+                assert not await state.update("missing", "value", version=1)
+
     @pytest.mark.asyncio
     async def test_delete(self) -> None:
         """Test state deletion."""
@@ -278,6 +384,49 @@ class TestStateManager:
             assert val2 == 6
             assert val3 == 7
 
+    @pytest.mark.asyncio
+    async def test_append_and_concurrent_increment(self) -> None:
+        """Test backend-level append and increment under concurrency."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for backend in (FileStateBackend(tmpdir), FileStateBackend(tmpdir, flush_interval=60)):
+                state = StateManager(backend)
+                await state.clear()
+                
+                await asyncio.gather(*(state.increment("counter") for _ in range(20)))
+                assert await state.get("counter") == 20
+                
+                assert await state.append("log", "a") == 1
+                assert await state.append("log", {"b": 2}) == 2
+                assert await state.get("log") == ["a", {"b": 2}]
+                
+                with pytest.raises(TypeError):
+                    await state.append("counter", 1)
+
+    @pytest.mark.asyncio
+    async def test_increment_refused_write(self) -> None:
+        """Test the default read-modify-write gives up when set() keeps failing."""
+        from kimi_agent_sdk.connectors.state import StateBackend
+        
+        class ReadOnlyBackend(StateBackend):
+            async def get(self, key: str) -> State | None:
+                return State(key=key, value=1, version=1)
+            
+            async def set(self, state: State) -> bool:
+                return False
+            
+            async def delete(self, key: str) -> bool:
+                return False
+            
+            async def list_keys(self, prefix: str = "") -> list[str]:
+                return []
+            
+            async def clear(self) -> int:
+                return 0
+        
+        state = StateManager(ReadOnlyBackend())
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(state.increment("counter"), timeout=5)
+
     @pytest.mark.asyncio
     async def test_list_keys(self) -> None:
         """Test listing state keys."""
@@ -294,6 +443,29 @@ class TestStateManager:
             prefix_keys = await state.list("prefix:")
             assert len(prefix_keys) == 2
 
+    @pytest.mark.asyncio
+    async def test_list_keys_index(self) -> None:
+        """Test the in-memory key index agrees with a directory scan."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            await StateManager(FileStateBackend(tmpdir)).set("prefix:old", 0)
+            backend = FileStateBackend(tmpdir, index_keys=True)
+            state = StateManager(backend)
+            
+            await state.set("prefix:key1", "value1")
+            await state.set("p", "value2")
+            await state.increment("other:counter")
+            await state.delete("prefix:key1")
+            
+            scanned = FileStateBackend(tmpdir)
+            for prefix in ("", "p", "pr", "prefix:", "other", "x"):
+                assert sorted(await backend.list_keys(prefix)) == sorted(
+                    await scanned.list_keys(prefix)
+                )
+            assert sorted(await state.list("p")) == ["p", "prefix:old"]
+            
+            await state.clear()
+            assert await state.list() == []
+
     @pytest.mark.asyncio
     async def test_clear(self) -> None:
         """Test clearing all state."""
@@ -310,6 +482,246 @@ class TestStateManager:
             assert not await state.exists("key2")
 
 
+    @pytest.mark.asyncio
+    async def test_batched_writes(self) -> None:
+        """Test buffered writes are readable at once and on disk after flush."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            backend = FileStateBackend(tmpdir, flush_interval=60)
+            state = StateManager(backend)
+            
+            for _ in range(5):
+                await state.increment("counter")
+            
+            assert await state.get("counter") == 5
+            assert not (Path(tmpdir) / "counter.json").exists()
+            
+            await backend.flush()
+            
+            reloaded = StateManager(FileStateBackend(tmpdir))
+            assert await reloaded.get("counter") == 5
+            assert (await reloaded.get_state_obj("counter")).version == 5
+
+    @pytest.mark.asyncio
+    async def test_flush_keeps_newer_timer(self) -> None:
+        """Test a timer started during a flush is not forgotten."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            backend = FileStateBackend(tmpdir, flush_interval=0.05)
+            state = StateManager(backend)
+            
+            await state.set("key1", "value1")
+            flush = asyncio.create_task(backend.flush())
+            await asyncio.sleep(0)  # the flush cancels the first timer
+            # Starts a new timer before the cancelled one has unwound
+            assert await backend.set(State(key="key1", value="value2", version=2))
+            await flush
+            assert backend._flush_task is not None  # still tracked, so flush() can cancel it
+            await asyncio.sleep(0.2)
+            
+            reloaded = StateManager(FileStateBackend(tmpdir))
+            assert await reloaded.get("key1") == "value2"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_set_same_version(self) -> None:
+        """Test only one of two racing writes of the same version wins."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            backend = FileStateBackend(tmpdir)
+            
+            results = await asyncio.gather(
+                backend.set(State(key="key", value="a", version=1)),
+                backend.set(State(key="key", value="b", version=1)),
+            )
+            
+            assert sorted(results) == [False, True]
+
+    @pytest.mark.asyncio
+    async def test_cache_write_through(self) -> None:
+        """Test cached reads stay consistent with writes and deletes."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state = StateManager(FileStateBackend(tmpdir), cache_size=1)
+            
+            await state.set("key1", "value1")
+            await state.set("key2", "value2")  # evicts key1
+            assert await state.get("key1") == "value1"
+            
+            assert await state.update("key1", "value3", version=1)
+            assert await state.get("key1") == "value3"
+            
+            reloaded = StateManager(FileStateBackend(tmpdir))
+            assert await reloaded.get("key1") == "value3"
+            
+            await state.delete("key1")
+            assert not await state.exists("key1")
+
+    @pytest.mark.asyncio
+    async def test_get_version(self) -> None:
+        """Test version lookup for new and legacy state files."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            backend = FileStateBackend(tmpdir)
+            state = StateManager(backend)
+            
+            await state.set("key", "value1")
+            await state.set("key", "value2")
+            assert await backend.get_version("key") == 2
+            assert await backend.get_version("missing") is None
+            
+            legacy = '{"key": "old", "value": [1, 2], "version": 7, "metadata": {}}'
+            (Path(tmpdir) / "old.json").write_text(legacy)
+            assert await backend.get_version("old") == 7
+
+    @pytest.mark.asyncio
+    async def test_record_layouts(self) -> None:
+        """Test positional records, labelled pretty files and legacy files."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            backend = FileStateBackend(tmpdir)
+            await StateManager(backend).set("compact", {"a": 1}, metadata={"m": True})
+            raw = (Path(tmpdir) / "compact.json").read_bytes().replace(b" ", b"")
+            assert raw == b'[1,"compact",{"m":true},{"a":1}]'
+            
+            pretty = FileStateBackend(tmpdir, pretty=True)
+            await StateManager(pretty).set("labelled", [1])
+            assert (Path(tmpdir) / "labelled.json").read_text().startswith('{\n  "version": 1')
+            
+            for key in ("compact", "labelled"):
+                assert await backend.get_version(key) == 1
+                assert (await pretty.get(key)).key == key
+
+    @pytest.mark.asyncio
+    async def test_exact_numbers(self) -> None:
+        """Test wide integers and non-finite floats read back unchanged."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            await StateManager(FileStateBackend(tmpdir)).set(
+                "numbers", {"big": 2**70, "small": -(2**70), "inf": float("inf")}
+            )
+            await StateManager(FileStateBackend(tmpdir)).set("nan", [float("nan")])
+            
+            state = StateManager(FileStateBackend(tmpdir))
+            assert await state.get("numbers") == {
+                "big": 2**70,
+                "small": -(2**70),
+                "inf": float("inf"),
+            }
+            [value] = await state.get("nan")
+            assert math.isnan(value)
+
+    @pytest.mark.asyncio
+    async def test_atomic_write(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test a failed write leaves the previous state and no temp file."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state = StateManager(FileStateBackend(tmpdir, fsync=True))
+            await state.set("key", "value1")
+            
+            def failing_write(fd: int, data: object) -> int:
+                raise OSError("disk full")
+            
+            monkeypatch.setattr("kimi_agent_sdk.connectors.state.os.write", failing_write)
+            with pytest.raises(OSError):
+                await state.set("key", "value2")
+            monkeypatch.undo()
+            
+            assert [p.name for p in Path(tmpdir).iterdir()] == ["key.json"]
+            assert await StateManager(FileStateBackend(tmpdir)).get("key") == "value1"
+
+    @pytest.mark.asyncio
+    async def test_msgpack_format(self) -> None:
+        """Test msgpack-encoded state files round-trip."""
+        pytest.importorskip("msgpack")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            backend = FileStateBackend(tmpdir, format="msgpack")
+            state = StateManager(backend)
+            
+            await state.set("run:1", {"blob": b"\x00\xff", "n": [1, 2.5]})
+            await state.set("run:1", {"blob": b"\x01", "n": []})
+            assert await state.get("run:1") == {"blob": b"\x01", "n": []}
+            assert await backend.get_version("run:1") == 2
+            assert (Path(tmpdir) / "run:1.msgpack").exists()
+            assert await backend.list_keys("run") == ["run:1"]
+            assert await backend.clear() == 1
+
+    @pytest.mark.asyncio
+    async def test_iter_value(self) -> None:
+        """Test iterating list values, including files large enough to stream."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state = StateManager(FileStateBackend(tmpdir))
+            
+            await state.set("small", [1, 2.5, "three"])
+            assert [item async for item in state.iter_value("small")] == [1, 2.5, "three"]
+            assert [item async for item in state.iter_value("missing")] == []
+            
+            messages = [{"i": i, "text": "x" * 40} for i in range(30000)]
+            await state.set("large", messages)
+            assert (Path(tmpdir) / "large.json").stat().st_size > 1 << 20
+            assert [item async for item in state.iter_value("large")] == messages
+            
+            await state.set("scalar", 5)
+            with pytest.raises(TypeError):
+                [item async for item in state.iter_value("scalar")]
+            
+            # A large dict with an "item" entry is not a list either
+            await state.set("mapping", {"item": messages})
+            with pytest.raises(TypeError):
+                [item async for item in state.iter_value("mapping")]
+            
+            # Lists in the metadata are not mistaken for the value
+            await state.set("tagged", messages, metadata={"item": [[0]]})
+            assert [item async for item in state.iter_value("tagged")] == messages
+
+    @pytest.mark.asyncio
+    async def test_redis_backend(self) -> None:
+        """Test the Redis backend against an in-memory fake server."""
+        fakeredis = pytest.importorskip("fakeredis")
+        from kimi_agent_sdk.connectors.state_redis import RedisStateBackend
+        
+        backend = RedisStateBackend(fakeredis.FakeAsyncRedis(), namespace="t*:")
+        state = StateManager(backend)
+        
+        await state.set("run:1", {"step": 1})
+        await state.set("run:1", {"step": 2})
+        assert await state.get("run:1") == {"step": 2}
+        assert await backend.get_version("run:1") == 2
+        assert not await backend.set(State(key="run:1", value={}, version=2))
+        assert await backend.list_keys("run") == ["run:1"]
+        
+        assert await state.increment("hits", 3) == 3
+        assert await state.append("log", "a") == 1
+        assert await state.append("log", "b") == 2
+        assert await state.get("log") == ["a", "b"]
+        
+        await state.set("meta", 1, metadata={"source": "test"})
+        assert await state.update("meta", 2, version=1)
+        assert not await state.update("meta", 3, version=1)
+        assert not await state.update("missing", 1, version=1)
+        assert (await state.get_state_obj("meta")) == State(
+            key="meta", value=2, version=2, metadata={"source": "test"}
+        )
+        assert await backend.clear() == 4
+
+    @pytest.mark.asyncio
+    async def test_stateful_key_fn(self) -> None:
+        """Test stateful persists results under the key_fn-derived key."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state = StateManager(FileStateBackend(tmpdir))
+            
+            @stateful(state, key_prefix="wf", key_fn=lambda user, **_: user)
+            async def workflow(user: str, step: int = 0) -> dict:
+                return {"step": step + 1}
+            
+            await workflow("alice", step=2)
+            assert await state.get("wf:workflow:alice") == {"step": 3}
+            
+            @stateful(state, key_prefix="wf")
+            async def unhashable(items: list) -> int:
+                return len(items)
+            
+            assert await unhashable([1, 2]) == 2
+            
+            @stateful(state, key_prefix="wf")
+            async def echo(value: object) -> str:
+                return type(value).__name__
+            
+            for value in (1, True, 1.0):
+                await echo(value)
+            assert len(await state.list("wf:echo:")) == 3
+
 class TestTimerSource:
     """Tests for TimerSource."""
 
@@ -362,6 +774,18 @@ class TestTimerSource:
         # Should not have received more events
         assert len(received) == count_before
 
+    @pytest.mark.asyncio
+    async def test_stop_wakes_sleeping_schedule(self) -> None:
+        """Test stop() does not wait out the remaining interval."""
+        bus = EventBus()
+        timer = TimerSource(bus)
+        await timer.start()
+        
+        timer.schedule("timer.slow", interval=10)
+        await asyncio.sleep(0.01)
+        
+        await asyncio.wait_for(timer.stop(), timeout=1)
+
 
 class TestIntegration:
     """Integration tests."""